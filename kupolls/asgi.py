@@ -2,6 +2,8 @@
 ASGI config for kupolls project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Unless ROOT_URLCONF is set in the environment, the polls app is served by
+its async views from kupolls.async_urls.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -12,5 +14,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kupolls.settings')
+os.environ.setdefault('ROOT_URLCONF', 'kupolls.async_urls')
 
 application = get_asgi_application()
@@ -0,0 +1,17 @@
+"""kupolls URL Configuration for ASGI.
+
+Same as kupolls.urls, but the polls app is served by its async views.
+kupolls.asgi selects it through the ROOT_URLCONF setting.
+"""
+from django.contrib import admin
+from django.urls import include, path
+from django.views.generic import RedirectView
+from . import views
+
+urlpatterns = [
+    path('polls/', include('polls.async_urls')),
+    path('admin/', admin.site.urls),
+    path('', RedirectView.as_view(url='polls/', permanent=True)),
+    path('accounts/', include('django.contrib.auth.urls')),
+    path('signup/', views.signup, name='signup'),
+]
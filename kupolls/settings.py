@@ -42,20 +42,25 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.middleware.StaticFilesMiddleware',
+    'polls.middleware.MetricsMiddleware',
+    'polls.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'polls.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'kupolls.urls'
+ROOT_URLCONF = config('ROOT_URLCONF', default='kupolls.urls')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to MetricsMiddleware.
+        'BACKEND': 'polls.metrics.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,6 +86,104 @@ DATABASES = {
     }
 }
 
+# Read replicas (see polls/routers.py)
+# DATABASE_REPLICA_NAMES lists copies of the default database, e.g. SQLite
+# files, that the index and results pages may read from. After a write a
+# client stays on the primary for REPLICA_STICKY_SECONDS.
+
+DATABASE_REPLICAS = []
+
+for number, name in enumerate(config('DATABASE_REPLICA_NAMES', cast=Csv(),
+                                     default=''), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'], 'NAME': name, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+# A replica alias with a test database of its own, so tests can tell reads
+# from a replica from reads of the primary. Unused unless a test lists it
+# in DATABASE_REPLICAS.
+DATABASES['test_replica'] = {
+    **DATABASES['default'],
+    'TEST': {'NAME': BASE_DIR / 'test_replica.sqlite3'}}
+
+DATABASE_ROUTERS = ['polls.routers.PrimaryReplicaRouter']
+
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', cast=int, default=5)
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# The in-memory default is per process. Use a shared backend such as
+# memcached or redis when running several workers, so cache invalidation
+# reaches all of them.
+
+CACHE_BACKEND = config('CACHE_BACKEND',
+                       default='django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Whether all workers see the same cache. Users and sessions are only
+# cached when they do, so a logout or password change reaches every worker.
+SHARED_CACHE = CACHE_BACKEND not in [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+# Longest time the index question list stays cached, in seconds.
+POLLS_INDEX_CACHE_TIMEOUT = config('POLLS_INDEX_CACHE_TIMEOUT', cast=int,
+                                   default=3600)
+
+# Live results stream (ASGI only, see polls/live.py)
+# Seconds between count checks, and the longest a stream stays open
+# before the browser reconnects.
+
+POLLS_STREAM_INTERVAL = config('POLLS_STREAM_INTERVAL', cast=float, default=2.0)
+
+POLLS_STREAM_MAX_AGE = config('POLLS_STREAM_MAX_AGE', cast=int, default=300)
+
+# Final results (see polls/snapshots.py)
+# A closed question's results are frozen SNAPSHOT_GRACE_SECONDS after its
+# end_date. Keep it above VOTE_BUFFER_INTERVAL so that votes queued just
+# before the end are written first.
+
+SNAPSHOT_GRACE_SECONDS = config('SNAPSHOT_GRACE_SECONDS', cast=int,
+                                default=60)
+
+# Vote throttling (see polls/throttle.py)
+# A repeated vote for the choice of the user's last vote on the question
+# within VOTE_DEDUP_SECONDS is ignored. Each user may vote VOTE_BURST times
+# in a row, then VOTE_RATE times per second. 0 for VOTE_DEDUP_SECONDS turns
+# the first check off; 0 for VOTE_BURST or VOTE_RATE the second.
+
+VOTE_DEDUP_SECONDS = config('VOTE_DEDUP_SECONDS', cast=int, default=5)
+
+VOTE_BURST = config('VOTE_BURST', cast=int, default=5)
+
+VOTE_RATE = config('VOTE_RATE', cast=float, default=0.5)
+
+# Request metrics served at /polls/metrics/ (see polls/metrics.py)
+# Scrapers send "Authorization: Bearer <METRICS_TOKEN>". Without a token
+# only staff users can read them.
+
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Sampled request profiling (see ProfilingMiddleware in polls/middleware.py)
+# PROFILE_SAMPLE_RATE is the fraction of requests run under cProfile. Staff
+# users can force a profile by sending the PROFILE_HEADER header. Profiles
+# are written to PROFILE_DIR, which is kept under PROFILE_MAX_BYTES.
+
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', cast=float, default=0.0)
+
+PROFILE_HEADER = config('PROFILE_HEADER', default='X-Profile')
+
+PROFILE_DIR = config('PROFILE_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+
+PROFILE_MAX_BYTES = config('PROFILE_MAX_BYTES', cast=int, default=50 * 2 ** 20)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -100,10 +203,27 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 AUTHENTICATION_BACKENDS = [
-    # username/password authentication
+    # username/password authentication, caching the logged-in user
+    'polls.auth.CachedModelBackend',
+    # keeps sessions from before the cached backend logged in
     'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Seconds a logged-in user is served from the cache (see polls/auth.py);
+# 0, the default without a shared cache, loads it on every request.
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', cast=int,
+                                 default=300 if SHARED_CACHE else 0)
+
+# With a shared cache, sessions are read from it and written through to
+# the database. Use 'django.contrib.sessions.backends.cache' to skip the
+# database entirely with a persistent shared cache, or
+# 'django.contrib.sessions.backends.signed_cookies' to store them in the
+# browser.
+SESSION_ENGINE = config('SESSION_ENGINE',
+                        default='django.contrib.sessions.backends.cached_db'
+                        if SHARED_CACHE
+                        else 'django.contrib.sessions.backends.db')
+
 LOGIN_REDIRECT_URL = '/polls/'
 
 # Internationalization
@@ -124,6 +244,40 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# "python manage.py collectstatic" copies the files here under hashed names
+# and writes gzip (and brotli, with the brotli package) copies, which
+# StaticFilesMiddleware serves. Hashed names are cached for a year; other
+# names for STATIC_MAX_AGE seconds.
+
+STATIC_ROOT = config('STATIC_ROOT',
+                     default=os.path.join(BASE_DIR, 'staticfiles'))
+
+STATIC_MAX_AGE = config('STATIC_MAX_AGE', cast=int, default=3600)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'polls.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Write-behind vote buffer (see polls/buffer.py)
+# Queued votes are written in batches of VOTE_BUFFER_SIZE or every
+# VOTE_BUFFER_INTERVAL seconds. An empty VOTE_BUFFER_JOURNAL keeps the
+# queue in memory only; a directory makes it survive a crash.
+
+VOTE_BUFFER_ENABLED = config('VOTE_BUFFER_ENABLED', cast=bool, default=False)
+
+VOTE_BUFFER_SIZE = config('VOTE_BUFFER_SIZE', cast=int, default=200)
+
+VOTE_BUFFER_INTERVAL = config('VOTE_BUFFER_INTERVAL', cast=float, default=1.0)
+
+VOTE_BUFFER_JOURNAL = config('VOTE_BUFFER_JOURNAL', default='')
+
+VOTE_BUFFER_FSYNC = config('VOTE_BUFFER_FSYNC', cast=bool, default=False)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
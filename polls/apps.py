@@ -7,3 +7,9 @@ class PollsConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        """Connect the cache invalidation and query counting signals."""
+        from . import auth, cache  # noqa: F401
+        from . import metrics
+        metrics.install_on_open_connections()
@@ -0,0 +1,23 @@
+"""Create urls for ku-polls served through ASGI."""
+from django.urls import path
+from django.contrib.auth.decorators import login_required
+
+from . import async_views, views
+from .routers import replica_reads
+
+app_name = 'polls'
+
+urlpatterns = [
+    path('', replica_reads(async_views.index), name='index'),
+    path('archive/', replica_reads(views.ArchiveView.as_view()),
+         name='archive'),
+    path('<int:pk>/', login_required(views.DetailView.as_view()), name='detail'),
+    path('<int:pk>/results/', replica_reads(async_views.results),
+         name='results'),
+    path('<int:pk>/results/stream/', async_views.results_stream,
+         name='results_stream'),
+    path('<int:pk>/results.json', replica_reads(views.results_json),
+         name='results_json'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('<int:question_id>/vote/', async_views.vote, name='vote'),
+]
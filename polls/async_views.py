@@ -0,0 +1,128 @@
+"""Async views for ku-polls, served by kupolls.asgi.
+
+These mirror the index, results and vote views in views.py but read through
+Django's async ORM, so under ASGI they run on the event loop instead of a
+worker thread. Sessions, transactions and template rendering are still sync
+in Django, so those steps are handed to a thread.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from .buffer import get_vote_buffer
+from .cache import alatest_questions
+from .live import tally_events
+from .models import Question, Choice, Vote
+from .snapshots import snapshot_for
+from .throttle import remember_vote, throttle_vote
+from .views import (count_pending_vote, get_votes_for_user,
+                    results_stream_url)
+
+
+async def get_request_user(request):
+    """Return the request's user, loading the session in a worker thread."""
+    if hasattr(request, 'auser'):
+        user = await request.auser()
+    else:
+        user = await sync_to_async(get_user)(request)
+    request.user = user
+    return user
+
+
+async def index(request):
+    """Show the last five published questions."""
+    questions = await alatest_questions()
+    user = await get_request_user(request)
+    voted = await sync_to_async(get_votes_for_user)(user, questions)
+    return TemplateResponse(request, 'polls/index.html',
+                            {'latest_question_list': questions,
+                             'voted': voted})
+
+
+async def results(request, pk):
+    """Show the vote totals of a question."""
+    choices = [choice async for choice in
+               Choice.objects.filter(question_id=pk).with_results()
+               .select_related('question__snapshot')]
+    if choices:
+        question = choices[0].question
+    else:
+        try:
+            question = await Question.objects.aget(pk=pk)
+        except Question.DoesNotExist:
+            raise Http404('No question matches the given query.')
+    snapshot = await sync_to_async(snapshot_for)(question, timezone.now())
+    if snapshot is not None:
+        return TemplateResponse(request, 'polls/results.html',
+                                {'question': question, 'object': question,
+                                 'snapshot': snapshot,
+                                 'total_votes': snapshot.total})
+    total_votes = choices[0].total_votes if choices else 0
+    buffer = get_vote_buffer()
+    if buffer is not None:
+        user = await get_request_user(request)
+        pending = (buffer.pending_choice(user.pk, question.pk)
+                   if user.is_authenticated else None)
+        if pending is not None:
+            stored = await (Vote.objects.filter(user=user, question=question)
+                            .values_list('choice_id', flat=True).afirst())
+            total_votes = count_pending_vote(choices, total_votes,
+                                             pending, stored)
+    return TemplateResponse(request, 'polls/results.html',
+                            {'question': question, 'object': question,
+                             'choices': choices, 'total_votes': total_votes,
+                             'stream_url': results_stream_url(question.pk)})
+
+
+async def results_stream(request, pk):
+    """Push the vote totals of a question as Server-Sent Events."""
+    try:
+        question = await Question.objects.aget(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404('No question matches the given query.')
+    response = StreamingHttpResponse(tally_events(question),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def vote(request, question_id):
+    """Keep vote result for question."""
+    user = await get_request_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    throttled = await sync_to_async(throttle_vote)(request, user.pk,
+                                                   question_id)
+    if throttled is not None:
+        return throttled
+    try:
+        selected_choice = await Choice.objects.select_related('question').aget(
+            pk=request.POST['choice'], question_id=question_id)
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        try:
+            question = await Question.objects.aget(pk=question_id)
+        except Question.DoesNotExist:
+            raise Http404('No question matches the given query.')
+        return TemplateResponse(request, 'polls/detail.html',
+                                {'question': question,
+                                 'error_message': "You didn't select a choice.",
+                                 })
+    question = selected_choice.question
+    if not question.can_vote() or question.votes_archived:
+        await sync_to_async(messages.error)(request, 'Vote is not allowed')
+        return redirect('polls:index')
+    buffer = get_vote_buffer()
+    if buffer is None:
+        await sync_to_async(Vote.objects.cast)(user, selected_choice)
+    elif buffer.queue(user.pk, selected_choice.question_id,
+                      selected_choice.pk):
+        await sync_to_async(buffer.flush)()
+    await sync_to_async(remember_vote)(user.pk, question_id,
+                                       selected_choice.pk)
+    return redirect('polls:results', question_id)
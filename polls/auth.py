@@ -0,0 +1,83 @@
+"""Authentication backend that keeps logged-in users in Django's cache.
+
+ModelBackend loads the User row on every request that touches
+request.user. CachedModelBackend keeps it for AUTH_USER_CACHE_TIMEOUT
+seconds instead, and drops it when the user is saved (a password, staff or
+last_login change) or deleted, or logs out. Changes made with
+QuerySet.update() bypass these signals and show after the timeout.
+
+The drop only reaches the workers sharing the cache, so the cache is only
+used when AUTH_USER_CACHE_TIMEOUT is above 0, which it only is by default
+with a shared CACHE_BACKEND. A system check warns when users or sessions
+are cached in a per-process cache.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.core import checks
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+PROCESS_CACHES = ['django.core.cache.backends.locmem.LocMemCache',
+                  'django.core.cache.backends.dummy.DummyCache']
+CACHED_SESSIONS = ['django.contrib.sessions.backends.cache',
+                   'django.contrib.sessions.backends.cached_db']
+
+
+def user_key(user_id):
+    """Return the cache key of a user."""
+    return f'polls:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() reads through the cache."""
+
+    def get_user(self, user_id):
+        """Return the active user with this id, from the cache if present."""
+        if settings.AUTH_USER_CACHE_TIMEOUT <= 0:
+            return super().get_user(user_id)
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+
+def forget_user(sender, instance=None, user=None, **kwargs):
+    """Drop the cached copy of a changed, deleted or logged out user."""
+    user = instance or user
+    if user is not None and user.pk is not None:
+        cache.delete(user_key(user.pk))
+
+
+post_save.connect(forget_user, sender=User,
+                  dispatch_uid='polls_forget_saved_user')
+post_delete.connect(forget_user, sender=User,
+                    dispatch_uid='polls_forget_deleted_user')
+user_logged_out.connect(forget_user, dispatch_uid='polls_forget_logged_out')
+
+
+@checks.register(checks.Tags.security)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when users or sessions are cached per process."""
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_CACHES:
+        return []
+    warnings = []
+    if settings.AUTH_USER_CACHE_TIMEOUT > 0:
+        warnings.append(checks.Warning(
+            'Logged-in users are cached in a per-process cache, so other '
+            'workers keep them after a logout or password change.',
+            hint='Set CACHE_BACKEND to a shared cache, or '
+                 'AUTH_USER_CACHE_TIMEOUT to 0.',
+            id='polls.W001'))
+    if settings.SESSION_ENGINE in CACHED_SESSIONS:
+        warnings.append(checks.Warning(
+            'Sessions are cached in a per-process cache, so other workers '
+            'keep them after a logout.',
+            hint='Set CACHE_BACKEND to a shared cache, or SESSION_ENGINE '
+                 'to django.contrib.sessions.backends.db.',
+            id='polls.W002'))
+    return warnings
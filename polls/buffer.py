@@ -0,0 +1,236 @@
+"""Write-behind buffer for incoming votes.
+
+When VOTE_BUFFER_ENABLED is set, vote() validates the choice and queues the
+vote here instead of writing it. Queued votes go to the Vote table in one
+batch once VOTE_BUFFER_SIZE votes are waiting or VOTE_BUFFER_INTERVAL seconds
+have passed, and a last time when the process exits.
+
+With VOTE_BUFFER_JOURNAL set to a directory, every queued vote is also
+appended to a per-process journal file there, so a crashed process does not
+lose its queue: the next process to start replays journals whose owner is
+gone. VOTE_BUFFER_FSYNC makes each append survive a power loss as well.
+The journal relies on POSIX file locks.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, IntegrityError, close_old_connections
+
+from .models import Vote
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PREFIX = 'votes-'
+JOURNAL_SUFFIX = '.jsonl'
+
+# Keeps each upsert batch below SQLite's bound-parameter limit.
+WRITE_BATCH = 500
+
+
+class VoteBuffer:
+    """Queue of votes waiting to be written, keyed by (user id, question id).
+
+    A user who votes twice before a flush only keeps their latest choice, so
+    the queue never holds more than one vote per user and question.
+    """
+
+    def __init__(self, size=200, interval=1.0, journal_dir='', fsync=False):
+        self.size = size
+        self.interval = interval
+        self.fsync = fsync
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        self._timer = None
+        if journal_dir:
+            self._open_journal(journal_dir)
+
+    def __len__(self):
+        """Return the number of queued votes."""
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, user_id, question_id, choice_id):
+        """Queue a vote, flushing when the queue reaches its size limit."""
+        if self.queue(user_id, question_id, choice_id):
+            self.flush()
+
+    def queue(self, user_id, question_id, choice_id):
+        """Queue a vote without touching the database.
+
+        Return True when the queue is full and should be flushed.
+        """
+        with self._lock:
+            self._pending[(user_id, question_id)] = choice_id
+            if self._journal is not None:
+                self._append_journal(user_id, question_id, choice_id)
+            full = len(self._pending) >= self.size
+        if not full:
+            self._start_timer()
+        return full
+
+    def pending_choice(self, user_id, question_id):
+        """Return the queued choice id of a user on a question, or None."""
+        with self._lock:
+            return self._pending.get((user_id, question_id))
+
+    def pending_choices(self, user_id, question_ids):
+        """Return {question id: queued choice id} of a user's queued votes."""
+        with self._lock:
+            return {question_id: self._pending[(user_id, question_id)]
+                    for question_id in question_ids
+                    if (user_id, question_id) in self._pending}
+
+    def flush(self):
+        """Write every queued vote to the database and return how many."""
+        with self._flush_lock:
+            with self._lock:
+                ballots, self._pending = self._pending, {}
+            if not ballots:
+                return 0
+            try:
+                keys = list(ballots)
+                for start in range(0, len(keys), WRITE_BATCH):
+                    self._write({key: ballots[key]
+                                 for key in keys[start:start + WRITE_BATCH]})
+            except DatabaseError:
+                # Put the votes back unless the user has voted again since.
+                with self._lock:
+                    for key, choice_id in ballots.items():
+                        self._pending.setdefault(key, choice_id)
+                raise
+            if self._journal is not None:
+                with self._lock:
+                    self._rewrite_journal()
+            return len(ballots)
+
+    def _write(self, ballots):
+        """Write a batch, falling back to one vote at a time on a bad vote."""
+        try:
+            Vote.objects.cast_many(ballots)
+        except IntegrityError:
+            if len(ballots) == 1:
+                logger.warning('Dropped invalid queued vote %r', ballots)
+                return
+            for key, choice_id in ballots.items():
+                self._write({key: choice_id})
+
+    def _start_timer(self):
+        """Start the background flush thread on first use."""
+        if self.interval <= 0 or self._timer is not None:
+            return
+        self._timer = threading.Thread(target=self._run_timer,
+                                       name='vote-buffer', daemon=True)
+        self._timer.start()
+
+    def _run_timer(self):
+        """Flush the queue every interval seconds."""
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Vote buffer flush failed')
+            finally:
+                close_old_connections()
+
+    def _open_journal(self, journal_dir):
+        """Open this process's journal and take over orphaned ones.
+
+        The journal may already hold votes of a crashed process that had
+        the same pid, as a restarted container's PID 1 does; they are
+        queued again like those of other orphaned journals.
+        """
+        os.makedirs(journal_dir, exist_ok=True)
+        path = os.path.join(journal_dir,
+                            f'{JOURNAL_PREFIX}{os.getpid()}{JOURNAL_SUFFIX}')
+        self._journal = open(path, 'a+', encoding='utf-8')
+        fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._journal.seek(0)
+        self._queue_journal(self._journal)
+        for name in sorted(os.listdir(journal_dir)):
+            other = os.path.join(journal_dir, name)
+            if (other != path and name.startswith(JOURNAL_PREFIX)
+                    and name.endswith(JOURNAL_SUFFIX)):
+                self._replay_journal(other)
+        if self._pending:
+            self._rewrite_journal()
+            self._start_timer()
+
+    def _replay_journal(self, path):
+        """Queue the votes of a journal whose process is no longer running."""
+        with open(path, encoding='utf-8') as journal:
+            try:
+                fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            self._queue_journal(journal)
+            os.unlink(path)
+
+    def _queue_journal(self, journal):
+        """Queue the votes read from an open journal file."""
+        for line in journal:
+            try:
+                user_id, question_id, choice_id = json.loads(line)
+            except ValueError:
+                continue
+            self._pending[(user_id, question_id)] = choice_id
+
+    def _append_journal(self, user_id, question_id, choice_id):
+        """Append one vote to the journal."""
+        self._journal.write(json.dumps([user_id, question_id, choice_id]) + '\n')
+        self._sync_journal()
+
+    def _rewrite_journal(self):
+        """Replace the journal with the votes still queued."""
+        self._journal.seek(0)
+        self._journal.truncate()
+        for (user_id, question_id), choice_id in self._pending.items():
+            self._journal.write(
+                json.dumps([user_id, question_id, choice_id]) + '\n')
+        self._sync_journal()
+
+    def _sync_journal(self):
+        """Push journal writes to the OS, and to disk if fsync is on."""
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """Return the process-wide vote buffer, or None when it is disabled."""
+    global _buffer
+    if not getattr(settings, 'VOTE_BUFFER_ENABLED', False):
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = VoteBuffer(
+                size=getattr(settings, 'VOTE_BUFFER_SIZE', 200),
+                interval=getattr(settings, 'VOTE_BUFFER_INTERVAL', 1.0),
+                journal_dir=getattr(settings, 'VOTE_BUFFER_JOURNAL', ''),
+                fsync=getattr(settings, 'VOTE_BUFFER_FSYNC', False))
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def _reset_vote_buffer(setting, **kwargs):
+    """Drop the buffer when its settings change, as tests do."""
+    global _buffer
+    if setting.startswith('VOTE_BUFFER_'):
+        with _buffer_lock:
+            _buffer = None
+
+
+setting_changed.connect(_reset_vote_buffer)
@@ -0,0 +1,76 @@
+"""Cache of the question list shown on the index page.
+
+The list only changes when a question is published, ends or is edited. It is
+kept in Django's cache until the next pub_date or end_date boundary and
+dropped whenever a Question is saved or deleted.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Question
+
+INDEX_KEY = 'polls:index'
+INDEX_SIZE = 5
+
+
+def latest_questions():
+    """Return the last five published questions, cached until they change."""
+    questions = cache.get(INDEX_KEY)
+    if questions is None:
+        now = timezone.now()
+        questions = list(Question.objects.published(now).with_status(now)
+                         .order_by('-pub_date')[:INDEX_SIZE])
+        next_pub_date = (Question.objects.filter(pub_date__gt=now)
+                         .aggregate(next=Min('pub_date'))['next'])
+        cache.set(INDEX_KEY, questions,
+                  index_timeout(questions, next_pub_date, now))
+    return questions
+
+
+async def alatest_questions():
+    """Async version of latest_questions()."""
+    questions = await cache.aget(INDEX_KEY)
+    if questions is None:
+        now = timezone.now()
+        questions = [question async for question in
+                     Question.objects.published(now).with_status(now)
+                     .order_by('-pub_date')[:INDEX_SIZE]]
+        next_pub_date = (await Question.objects.filter(pub_date__gt=now)
+                         .aaggregate(next=Min('pub_date')))['next']
+        await cache.aset(INDEX_KEY, questions,
+                         index_timeout(questions, next_pub_date, now))
+    return questions
+
+
+def index_timeout(questions, next_pub_date, now):
+    """Return how long the list and the status of its questions hold.
+
+    The list stays valid until the next pub_date of any question or the next
+    end_date of a listed one, whichever comes first. Return the seconds
+    until then, capped by POLLS_INDEX_CACHE_TIMEOUT.
+    """
+    boundaries = [question.end_date for question in questions
+                  if question.end_date is not None and question.end_date > now]
+    if next_pub_date is not None:
+        boundaries.append(next_pub_date)
+    timeout = getattr(settings, 'POLLS_INDEX_CACHE_TIMEOUT', 3600)
+    if boundaries:
+        until_boundary = (min(boundaries) - now).total_seconds()
+        timeout = min(timeout, max(1, math.ceil(until_boundary)))
+    return timeout
+
+
+def invalidate_index(**kwargs):
+    """Drop the cached index when a question changes."""
+    cache.delete(INDEX_KEY)
+
+
+post_save.connect(invalidate_index, sender=Question,
+                  dispatch_uid='polls_invalidate_index_on_save')
+post_delete.connect(invalidate_index, sender=Question,
+                    dispatch_uid='polls_invalidate_index_on_delete')
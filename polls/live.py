@@ -0,0 +1,142 @@
+"""Live results pushed to browsers with Server-Sent Events.
+
+Each process keeps one TallyFeed per watched question. The feed reads the
+question's counters once every POLLS_STREAM_INTERVAL seconds, however many
+browsers are listening, and wakes the listeners only when a count changed.
+So each listener gets at most one update per interval.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import weakref
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .models import Choice
+
+logger = logging.getLogger(__name__)
+
+# Comment line sent when nothing changed for this long, so proxies keep the
+# connection open.
+KEEPALIVE = 15
+
+_feeds = weakref.WeakKeyDictionary()
+
+
+async def load_tally(question_id):
+    """Return the current counts of a question as a JSON-ready dict."""
+    counts = [(pk, stored + sharded) async for pk, stored, sharded in
+              Choice.objects.filter(question_id=question_id)
+              .with_shard_votes().order_by('pk')
+              .values_list('pk', 'vote_count', 'shard_votes')]
+    total = sum(votes for _, votes in counts)
+    return {
+        'question': question_id,
+        'total': total,
+        'choices': [{'id': pk, 'votes': votes,
+                     'percent': round(100 * votes / total, 1) if total else 0.0}
+                    for pk, votes in counts],
+    }
+
+
+class TallyFeed:
+    """Polls the counts of one question on behalf of all its listeners."""
+
+    def __init__(self, question_id, interval):
+        self.question_id = question_id
+        self.interval = interval
+        self.tally = None
+        self.version = 0
+        self.listeners = 0
+        self.changed = asyncio.Condition()
+        self.task = None
+
+    async def run(self):
+        """Reload the counts every interval while anyone is listening."""
+        try:
+            while self.listeners:
+                try:
+                    tally = await load_tally(self.question_id)
+                except DatabaseError:
+                    logger.exception('Could not load tally of question %s',
+                                     self.question_id)
+                    tally = self.tally
+                if tally != self.tally:
+                    async with self.changed:
+                        self.tally = tally
+                        self.version += 1
+                        self.changed.notify_all()
+                await asyncio.sleep(self.interval)
+        finally:
+            self.task = None
+
+    async def listen(self, until):
+        """Yield each new tally until the given time.
+
+        None is yielded after KEEPALIVE seconds without a change.
+        """
+        self.listeners += 1
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        seen = 0
+        try:
+            while True:
+                remaining = (until - timezone.now()).total_seconds()
+                if remaining <= 0:
+                    return
+                tally = None
+                async with self.changed:
+                    try:
+                        await asyncio.wait_for(
+                            self.changed.wait_for(
+                                lambda: self.version != seen),
+                            min(KEEPALIVE, remaining))
+                    except asyncio.TimeoutError:
+                        pass
+                    else:
+                        seen = self.version
+                        tally = self.tally
+                if tally is None and timezone.now() >= until:
+                    return
+                yield tally
+        finally:
+            self.listeners -= 1
+
+
+def get_feed(question_id):
+    """Return the feed of a question for the running event loop."""
+    feeds = _feeds.setdefault(asyncio.get_running_loop(), {})
+    feed = feeds.get(question_id)
+    if feed is None:
+        interval = getattr(settings, 'POLLS_STREAM_INTERVAL', 2.0)
+        feed = feeds[question_id] = TallyFeed(question_id, interval)
+    return feed
+
+
+def event(name, data):
+    """Format one Server-Sent Event."""
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+async def tally_events(question):
+    """Stream the tally of a question until the poll ends.
+
+    A connection is also closed after POLLS_STREAM_MAX_AGE seconds; the
+    browser reconnects by itself.
+    """
+    max_age = getattr(settings, 'POLLS_STREAM_MAX_AGE', 300)
+    until = timezone.now() + datetime.timedelta(seconds=max_age)
+    if question.end_date is not None and question.end_date < until:
+        until = question.end_date
+    interval = getattr(settings, 'POLLS_STREAM_INTERVAL', 2.0)
+    yield f'retry: {int(interval * 1000)}\n\n'
+    async for tally in get_feed(question.pk).listen(until):
+        if tally is None:
+            yield ': keepalive\n\n'
+        else:
+            yield event('tally', tally)
+    if question.end_date is not None and question.end_date <= timezone.now():
+        yield event('closed', await load_tally(question.pk))
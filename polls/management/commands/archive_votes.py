@@ -0,0 +1,44 @@
+"""Move the votes of long closed questions to the archive table."""
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls.cache import invalidate_index
+from polls.models import ArchivedVote
+
+
+class Command(BaseCommand):
+    """Archive the votes of questions closed for a while, or restore some."""
+
+    help = 'Move votes of questions closed long ago to ArchivedVote.'
+
+    def add_arguments(self, parser):
+        """Accept the retention period, batch size and questions to restore."""
+        parser.add_argument('--older-than', type=float, default=180,
+                            metavar='DAYS',
+                            help='Archive questions closed more than DAYS '
+                                 'ago (default 180).')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Votes moved per transaction '
+                                 '(default 1000).')
+        parser.add_argument('--restore', nargs='+', type=int, default=None,
+                            metavar='QUESTION_ID',
+                            help='Move the votes of these questions back, '
+                                 'e.g. before reopening them.')
+
+    def handle(self, *args, **options):
+        """Archive or restore and report how many votes were moved."""
+        if options['restore']:
+            moved = ArchivedVote.objects.restore(options['restore'],
+                                                 options['batch_size'])
+            message = f'Restored {moved} votes.'
+        else:
+            before = timezone.now() - datetime.timedelta(
+                days=options['older_than'])
+            questions, moved = ArchivedVote.objects.archive(
+                before, options['batch_size'])
+            message = f'Archived {moved} votes of {questions} questions.'
+        # The cached index holds each question's votes_archived flag.
+        invalidate_index()
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,26 @@
+"""Fold old vote events into a tally checkpoint."""
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls.models import VoteEvent
+
+
+class Command(BaseCommand):
+    """Fold events older than a given age and delete them."""
+
+    help = 'Fold old VoteEvent rows into a new TallyCheckpoint.'
+
+    def add_arguments(self, parser):
+        """Accept the age of the events to keep."""
+        parser.add_argument('--older-than', type=float, default=24,
+                            metavar='HOURS',
+                            help='Fold events older than HOURS (default 24).')
+
+    def handle(self, *args, **options):
+        """Compact and report how many events were folded."""
+        before = timezone.now() - datetime.timedelta(
+            hours=options['older_than'])
+        folded = VoteEvent.objects.compact(before)
+        self.stdout.write(self.style.SUCCESS(f'Folded {folded} events.'))
@@ -0,0 +1,190 @@
+"""Compare WSGI and ASGI request handling on the same workload."""
+import asyncio
+import io
+import itertools
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client, override_settings
+
+HOST = 'localhost'
+FORM = 'application/x-www-form-urlencoded'
+
+
+class Command(BaseCommand):
+    """Send the same requests through the WSGI and ASGI handlers.
+
+    WSGI runs sync views from kupolls.urls on a thread pool, as a threaded
+    WSGI server would. ASGI runs async views from kupolls.async_urls as
+    concurrent tasks on one event loop. Network and server overhead are
+    left out, so the numbers compare the Django side of each stack.
+
+    GET paths and --post forms are sent in turn, so votes can be mixed
+    with page views. Forms carry a CSRF cookie and token as a browser's do.
+    """
+
+    help = 'Report requests per second and latency for WSGI and ASGI.'
+
+    def add_arguments(self, parser):
+        """Accept the paths to request and the load shape."""
+        parser.add_argument('paths', nargs='*', default=['/polls/'],
+                            help='Paths to request in turn.')
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Number of requests per mode.')
+        parser.add_argument('--concurrency', type=int, default=20,
+                            help='Requests in flight at once.')
+        parser.add_argument('--post', nargs=2, action='append', default=[],
+                            metavar=('PATH', 'FORM'),
+                            help='Also POST this urlencoded form, e.g. '
+                                 '/polls/1/vote/ choice=1. Repeatable.')
+        parser.add_argument('--username',
+                            help='Send the requests logged in as this user.')
+
+    def handle(self, *args, **options):
+        """Run both modes and print one line per mode."""
+        workload = ([('GET', path, b'') for path in options['paths']]
+                    + [('POST', path, form.encode())
+                       for path, form in options['post']])
+        requests = list(itertools.islice(itertools.cycle(workload),
+                                         options['requests']))
+        cookie, token = self.csrf_cookie()
+        session = self.session_cookie(options['username'])
+        if session:
+            cookie = f'{cookie}; {session}'
+        headers = {'cookie': cookie, 'x-csrftoken': token}
+        concurrency = options['concurrency']
+        with override_settings(ROOT_URLCONF='kupolls.urls'):
+            wsgi = self.run_wsgi(requests, headers, concurrency)
+        with override_settings(ROOT_URLCONF='kupolls.async_urls'):
+            asgi = asyncio.run(self.run_asgi(requests, headers,
+                                             concurrency))
+        self.stdout.write(f'{"mode":<6}{"req/s":>10}{"p50 ms":>10}'
+                          f'{"p99 ms":>10}{"errors":>8}')
+        for mode, (elapsed, timings, errors) in (('wsgi', wsgi),
+                                                 ('asgi', asgi)):
+            self.stdout.write(f'{mode:<6}{len(timings) / elapsed:>10.1f}'
+                              f'{percentile(timings, 50):>10.2f}'
+                              f'{percentile(timings, 99):>10.2f}'
+                              f'{errors:>8}')
+
+    def csrf_cookie(self):
+        """Return a CSRF cookie and the matching token for POST requests."""
+        request = HttpRequest()
+        token = get_token(request)
+        return (f'{settings.CSRF_COOKIE_NAME}={request.META["CSRF_COOKIE"]}',
+                token)
+
+    def session_cookie(self, username):
+        """Return a Cookie header value for a session of the given user."""
+        if not username:
+            return ''
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Unknown user "{username}".')
+        client = Client()
+        client.force_login(user)
+        return '; '.join(f'{name}={morsel.value}'
+                         for name, morsel in client.cookies.items())
+
+    def run_wsgi(self, requests, headers, concurrency):
+        """Send the requests through WSGIHandler on a thread pool."""
+        handler = WSGIHandler()
+
+        def send(request):
+            method, path, body = request
+            environ = {'REQUEST_METHOD': method, 'PATH_INFO': path,
+                       'HTTP_HOST': HOST, 'CONTENT_TYPE': FORM,
+                       'CONTENT_LENGTH': str(len(body)),
+                       'wsgi.input': io.BytesIO(body)}
+            for name, value in headers.items():
+                environ['HTTP_' + name.upper().replace('-', '_')] = value
+            setup_testing_defaults(environ)
+            statuses = []
+            start = time.perf_counter()
+            response = handler(environ,
+                               lambda status, headers: statuses.append(status))
+            for _ in response:
+                pass
+            response.close()
+            return time.perf_counter() - start, statuses[0]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            outcomes = list(pool.map(send, requests))
+        return summarize(time.perf_counter() - start, outcomes)
+
+    async def run_asgi(self, requests, headers, concurrency):
+        """Send the requests through ASGIHandler as concurrent tasks."""
+        handler = ASGIHandler()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def send(request):
+            async with slots:
+                start = time.perf_counter()
+                status = await asgi_request(handler, *request, headers)
+                return time.perf_counter() - start, status
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(send(request)
+                                          for request in requests))
+        return summarize(time.perf_counter() - start, outcomes)
+
+
+async def asgi_request(handler, method, path, body, headers):
+    """Send one request to an ASGI app and return its status."""
+    headers = dict(headers, host=HOST, **{'content-type': FORM,
+                                          'content-length': str(len(body))})
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(name.encode(), value.encode())
+                    for name, value in headers.items()],
+        'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+    }
+    sent = False
+    done = asyncio.Event()
+    status = []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body,
+                    'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif not message.get('more_body'):
+            done.set()
+
+    await handler(scope, receive, send)
+    done.set()
+    return status[0]
+
+
+def summarize(elapsed, outcomes):
+    """Return elapsed time, latencies in ms and the number of 5xx answers."""
+    timings = [seconds * 1000 for seconds, _ in outcomes]
+    errors = sum(1 for _, status in outcomes if str(status).startswith('5'))
+    return elapsed, timings, errors
+
+
+def percentile(values, percent):
+    """Return the given percentile of a list of numbers."""
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
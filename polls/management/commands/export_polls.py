@@ -0,0 +1,50 @@
+"""Stream questions, choices and votes to a JSON Lines or CSV file."""
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime
+
+from polls.models import Question
+from polls.transfer import FORMATS, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    """Export polls without loading them all into memory."""
+
+    help = 'Export questions, choices and votes as JSON Lines or CSV.'
+
+    def add_arguments(self, parser):
+        """Accept the output, its format and a pub_date range."""
+        parser.add_argument('output', nargs='?', default='-',
+                            help='File to write, or - for standard output.')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--since', type=parse_datetime,
+                            help='Only questions published at or after this.')
+        parser.add_argument('--until', type=parse_datetime,
+                            help='Only questions published before this.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database at a time.')
+        parser.add_argument('--progress-every', type=int, default=10000,
+                            help='Report progress after this many rows.')
+
+    def handle(self, *args, **options):
+        """Write the rows and report progress on standard error."""
+        questions = Question.objects.all()
+        if options['since']:
+            questions = questions.filter(pub_date__gte=options['since'])
+        if options['until']:
+            questions = questions.filter(pub_date__lt=options['until'])
+        rows = export_rows(questions, options['chunk_size'])
+        if options['output'] == '-':
+            count = self.write(rows, self.stdout, options)
+        else:
+            with open(options['output'], 'w', newline='',
+                      encoding='utf-8') as output:
+                count = self.write(rows, output, options)
+        self.stderr.write(f'Exported {count} rows.')
+
+    def write(self, rows, stream, options):
+        """Write rows to the stream and return how many were written."""
+        count = 0
+        for count in write_rows(rows, stream, options['format']):
+            if count % options['progress_every'] == 0:
+                self.stderr.write(f'{count} rows exported...')
+        return count
@@ -0,0 +1,54 @@
+"""Load questions, choices and votes from a JSON Lines or CSV dump."""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.transfer import FORMATS, Importer, read_rows
+
+
+class Command(BaseCommand):
+    """Import a dump made by export_polls in fixed-size batches."""
+
+    help = 'Import questions, choices and votes from JSON Lines or CSV.'
+
+    def add_arguments(self, parser):
+        """Accept the input, its format and the batch size."""
+        parser.add_argument('input', help='File to read, or - for standard input.')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Defaults to the file extension, else jsonl.')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows written per bulk_create.')
+        parser.add_argument('--progress-every', type=int, default=10000,
+                            help='Report progress after this many rows.')
+
+    def handle(self, *args, **options):
+        """Read the dump row by row and write it in batches."""
+        fmt = options['format']
+        if fmt is None:
+            fmt = 'csv' if options['input'].endswith('.csv') else 'jsonl'
+        importer = Importer(options['batch_size'])
+        if options['input'] == '-':
+            count = self.load(read_rows(sys.stdin, fmt), importer, options)
+        else:
+            try:
+                with open(options['input'], newline='',
+                          encoding='utf-8') as stream:
+                    count = self.load(read_rows(stream, fmt), importer,
+                                      options)
+            except FileNotFoundError:
+                raise CommandError(f'No such file "{options["input"]}".')
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {count} rows: imported {importer.imported}, '
+            f'skipped {importer.skipped} votes of unknown users.'))
+
+    def load(self, rows, importer, options):
+        """Feed rows to the importer and return how many were read."""
+        count = 0
+        try:
+            for count, row in enumerate(rows, 1):
+                importer.add(row)
+                if count % options['progress_every'] == 0:
+                    self.stderr.write(f'{count} rows read...')
+        finally:
+            importer.finish()
+        return count
@@ -0,0 +1,27 @@
+"""Fold the sharded vote counters back into Choice.vote_count."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.models import ChoiceShard
+
+
+class Command(BaseCommand):
+    """Merge the shard counts once, or every few seconds."""
+
+    help = 'Move ChoiceShard counts into Choice.vote_count.'
+
+    def add_arguments(self, parser):
+        """Accept an optional repeat interval."""
+        parser.add_argument('--every', type=float, default=None,
+                            metavar='SECONDS',
+                            help='Keep running and merge every SECONDS.')
+
+    def handle(self, *args, **options):
+        """Merge and report how many shards were folded in."""
+        while True:
+            merged = ChoiceShard.objects.merge()
+            self.stdout.write(self.style.SUCCESS(f'Merged {merged} shards.'))
+            if options['every'] is None:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,38 @@
+"""Summarize the request profiles saved by ProfilingMiddleware."""
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.profiling import list_profiles
+
+SORT_KEYS = ['cumulative', 'tottime', 'ncalls']
+
+
+class Command(BaseCommand):
+    """Merge the saved profiles and print the hottest functions."""
+
+    help = 'Print the hottest functions of the saved request profiles.'
+
+    def add_arguments(self, parser):
+        """Accept the directory, a view filter, sort order and limit."""
+        parser.add_argument('--dir', default=None,
+                            help='Profile directory (default PROFILE_DIR).')
+        parser.add_argument('--view', default=None,
+                            help='Only profiles of this URL name, '
+                                 'e.g. polls:vote.')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative',
+                            help='Order of the functions (default cumulative).')
+        parser.add_argument('--limit', type=int, default=25,
+                            help='Number of functions to print (default 25).')
+
+    def handle(self, *args, **options):
+        """Merge the matching profiles and print their statistics."""
+        paths = list_profiles(options['dir'] or settings.PROFILE_DIR,
+                              options['view'])
+        if not paths:
+            raise CommandError('No profiles found.')
+        stats = pstats.Stats(*paths, stream=self.stdout)
+        self.stdout.write(f'{len(paths)} profiles')
+        stats.strip_dirs().sort_stats(options['sort'])
+        stats.print_stats(options['limit'])
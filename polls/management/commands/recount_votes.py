@@ -0,0 +1,29 @@
+"""Rebuild the stored vote counters from the Vote table."""
+from django.core.management.base import BaseCommand
+
+from polls.models import Choice
+
+
+class Command(BaseCommand):
+    """Recount the votes of every choice, or of the given questions."""
+
+    help = 'Rebuild Choice.vote_count from the Vote table.'
+
+    def add_arguments(self, parser):
+        """Accept an optional list of question ids."""
+        parser.add_argument('question_ids', nargs='*', type=int,
+                            help='Only recount choices of these questions.')
+        parser.add_argument('--from-log', action='store_true',
+                            help='Replay the vote log from its last '
+                                 'checkpoint instead of scanning votes.')
+
+    def handle(self, *args, **options):
+        """Recount and report how many choices were updated."""
+        choices = Choice.objects.all()
+        if options['question_ids']:
+            choices = choices.filter(question_id__in=options['question_ids'])
+        if options['from_log']:
+            updated = choices.replay_votes()
+        else:
+            updated = choices.recount_votes()
+        self.stdout.write(self.style.SUCCESS(f'Recounted {updated} choices.'))
@@ -0,0 +1,35 @@
+"""Freeze the results of closed questions that have no snapshot yet."""
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+
+from polls.models import Question
+from polls.snapshots import freeze
+
+
+class Command(BaseCommand):
+    """Backfill ResultSnapshot for every closed question."""
+
+    help = 'Store the final results of closed questions.'
+
+    def add_arguments(self, parser):
+        """Accept a flag to refreeze existing snapshots."""
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Refreeze questions that have a snapshot.')
+
+    def handle(self, *args, **options):
+        """Freeze each closed question and report how many were stored."""
+        grace = datetime.timedelta(seconds=settings.SNAPSHOT_GRACE_SECONDS)
+        questions = Question.objects.closed(timezone.now() - grace)
+        if not options['rebuild']:
+            questions = questions.filter(
+                Q(snapshot__isnull=True)
+                | ~Q(snapshot__end_date=F('end_date')))
+        frozen = 0
+        for question in questions.order_by('pk').iterator():
+            freeze(question)
+            frozen += 1
+        self.stdout.write(self.style.SUCCESS(f'Froze {frozen} questions.'))
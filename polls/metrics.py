@@ -0,0 +1,182 @@
+"""Per-view request metrics in fixed-size histograms.
+
+MetricsMiddleware measures each request and files it under the resolved URL
+name, e.g. polls:index:
+
+- polls_request_seconds: wall time of the whole request
+- polls_db_queries: number of SQL queries
+- polls_db_seconds: time spent running SQL
+- polls_template_seconds: time spent rendering templates
+
+SQL is seen through an execute wrapper installed on every database
+connection, and templates through TimedDjangoTemplates, which must be the
+template BACKEND. Each histogram is a fixed list of bucket counters, so
+memory only grows with the number of URL names. Metrics are per process.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+                2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+METRICS = {
+    'polls_request_seconds': ('Wall time of a request.', TIME_BUCKETS),
+    'polls_db_queries': ('SQL queries run by a request.', QUERY_BUCKETS),
+    'polls_db_seconds': ('Time a request spent running SQL.', TIME_BUCKETS),
+    'polls_template_seconds': ('Time a request spent rendering templates.',
+                               TIME_BUCKETS),
+}
+
+current_stats = contextvars.ContextVar('polls_request_stats', default=None)
+
+
+class RequestStats:
+    """Costs gathered while one request is handled."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class Histogram:
+    """Cumulative histogram over fixed bucket bounds."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Count one value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms of every metric, keyed by metric name and view name."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, wall_seconds, stats):
+        """File the costs of one request under its view."""
+        values = {
+            'polls_request_seconds': wall_seconds,
+            'polls_db_queries': stats.queries,
+            'polls_db_seconds': stats.db_seconds,
+            'polls_template_seconds': stats.template_seconds,
+        }
+        with self._lock:
+            for name, value in values.items():
+                key = (name, view)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(METRICS[name][1])
+                self._histograms[key].observe(value)
+
+    def clear(self):
+        """Forget every observation."""
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """Return all histograms in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in METRICS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), histogram in sorted(
+                        self._histograms.items()):
+                    if metric == name:
+                        lines.extend(histogram_lines(name, view, histogram))
+        return '\n'.join(lines) + '\n'
+
+
+def histogram_lines(name, view, histogram):
+    """Return the bucket, sum and count lines of one histogram."""
+    label = view.replace('\\', '\\\\').replace('"', '\\"')
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} '
+                     f'{cumulative}')
+    lines.append(f'{name}_sum{{view="{label}"}} {histogram.sum:.6f}')
+    lines.append(f'{name}_count{{view="{label}"}} {histogram.count}')
+    return lines
+
+
+registry = Registry()
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper adding each query to the current request's stats."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+def install_query_counter(connection, **kwargs):
+    """Add count_query to a database connection once."""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def install_on_open_connections():
+    """Add count_query to the connections of this thread."""
+    for connection in connections.all():
+        install_query_counter(connection)
+
+
+connection_created.connect(install_query_counter,
+                           dispatch_uid='polls_install_query_counter')
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend adding render time to the request's stats."""
+
+    def get_template(self, template_name):
+        """Return the template wrapped in a timer."""
+        return TimedTemplate(super().get_template(template_name))
+
+    def from_string(self, template_code):
+        """Return the compiled template wrapped in a timer."""
+        return TimedTemplate(super().from_string(template_code))
+
+
+class TimedTemplate:
+    """Template wrapper timing render()."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        """Render the template and record how long it took."""
+        stats = current_stats.get()
+        if stats is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - start
@@ -0,0 +1,270 @@
+"""Middleware for ku-polls."""
+import cProfile
+import logging
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import unquote
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .metrics import RequestStats, current_stats, registry
+from .profiling import profile_path, rotate
+from .routers import RequestRouting, current_request
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED = '<unresolved>'
+STICKY_COOKIE = 'polls_primary'
+
+# Names written by ManifestStaticFilesStorage, e.g. style.4f3c9a1b2d7e.css
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class StaticFilesMiddleware:
+    """Serve collected static files with long-lived cache headers.
+
+    Files under STATIC_URL are sent from STATIC_ROOT, using the .br or .gz
+    copy written by collectstatic when the client accepts it. Hashed names
+    are cached for a year as immutable, other names for STATIC_MAX_AGE
+    seconds. Requests for files that were not collected pass through.
+    Put it first in MIDDLEWARE; a web server serving STATIC_ROOT with the
+    same headers can replace it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        """Return a response for a collected static file, else None."""
+        prefix = settings.STATIC_URL
+        if (request.method not in ('GET', 'HEAD') or not prefix
+                or not settings.STATIC_ROOT
+                or not request.path.startswith(prefix)):
+            return None
+        name = unquote(request.path[len(prefix):])
+        try:
+            path = staticfiles_storage.path(name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        mtime = os.stat(path).st_mtime
+        if not was_modified_since(
+                request.headers.get('If-Modified-Since'), mtime):
+            return HttpResponseNotModified()
+        content_type, _ = mimetypes.guess_type(name)
+        accepted = request.headers.get('Accept-Encoding', '')
+        encoding = None
+        for candidate, suffix in ENCODINGS:
+            if candidate in accepted and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream')
+        del response['Content-Disposition']
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(mtime)
+        if HASHED_NAME.search(name):
+            response['Cache-Control'] = IMMUTABLE
+        else:
+            response['Cache-Control'] = \
+                f'public, max-age={settings.STATIC_MAX_AGE}'
+        return response
+
+
+class MetricsMiddleware:
+    """Record wall time, SQL and template cost per URL name.
+
+    Put it first in MIDDLEWARE, after StaticFilesMiddleware, so the time
+    spent in other middleware is counted too. Works for both sync and
+    async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            current_stats.reset(token)
+            registry.observe(view_name(request),
+                             time.perf_counter() - start, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+            registry.observe(view_name(request),
+                             time.perf_counter() - start, stats)
+
+
+class ReplicaMiddleware:
+    """Track database writes per request for PrimaryReplicaRouter.
+
+    A response to a request that wrote sets a cookie that keeps the client
+    on the primary for REPLICA_STICKY_SECONDS. Place it before
+    SessionMiddleware so session writes count too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = RequestRouting(sticky=STICKY_COOKIE in request.COOKIES)
+        token = current_request.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.stick(routing, response)
+
+    async def __acall__(self, request):
+        routing = RequestRouting(sticky=STICKY_COOKIE in request.COOKIES)
+        token = current_request.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.stick(routing, response)
+
+    def stick(self, routing, response):
+        """Set the sticky cookie when the request wrote to the primary."""
+        if routing.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(STICKY_COOKIE, '1',
+                                max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class ProfilingMiddleware:
+    """Run a sample of requests under cProfile and save the profiles.
+
+    PROFILE_SAMPLE_RATE of the requests are profiled, as is every request
+    from a staff user carrying the PROFILE_HEADER header. Only one request
+    is profiled at a time; a sampled request arriving meanwhile runs
+    normally. Place it after AuthenticationMiddleware.
+
+    cProfile only sees the thread it runs in, and the async stack runs most
+    of the work in other threads, so async requests are passed through
+    unprofiled. Profile the WSGI server instead.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    _lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        if not self.wants_profile(request) or \
+                not self._lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            self._lock.release()
+
+    def wants_profile(self, request):
+        """Return whether the request is sampled or asked to be profiled."""
+        rate = settings.PROFILE_SAMPLE_RATE
+        if rate > 0 and random.random() < rate:
+            return True
+        header = settings.PROFILE_HEADER
+        return bool(header and header in request.headers
+                    and getattr(request, 'user', None) is not None
+                    and request.user.is_staff)
+
+    def profile(self, request):
+        """Handle the request under cProfile and save the profile."""
+        stats = current_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = current_stats.set(stats)
+        queries = stats.queries
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            if token is not None:
+                current_stats.reset(token)
+        self.save(profiler, view_name(request), stats.queries - queries)
+        return response
+
+    def save(self, profiler, view, queries):
+        """Write a profile to PROFILE_DIR and drop the oldest over the cap."""
+        directory = settings.PROFILE_DIR
+        try:
+            os.makedirs(directory, exist_ok=True)
+            profiler.dump_stats(profile_path(directory, view, queries))
+            rotate(directory, settings.PROFILE_MAX_BYTES)
+        except OSError:
+            logger.exception('Could not save the profile of %s', view)
+
+
+def view_name(request):
+    """Return the URL name the request resolved to."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.view_name:
+        return UNRESOLVED
+    return match.view_name
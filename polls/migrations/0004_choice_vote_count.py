@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:59
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_votes(apps, schema_editor):
+    """Fill the new counters from the votes already stored."""
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    tally = (Vote.objects.filter(choice=OuterRef('pk'))
+             .order_by().values('choice')
+             .annotate(total=Count('pk')).values('total'))
+    Choice.objects.update(vote_count=Coalesce(Subquery(tally), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_auto_20211030_1359'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_votes, migrations.RunPython.noop),
+    ]
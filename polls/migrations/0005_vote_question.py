@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:20
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_vote_question(apps, schema_editor):
+    """Copy the question onto each vote and drop duplicate votes.
+
+    Only the latest vote of a user on a question is kept, then the choice
+    counters are rebuilt so they match the remaining votes.
+    """
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    Vote.objects.update(question=Subquery(
+        Choice.objects.filter(pk=OuterRef('choice')).values('question')))
+    latest = (Vote.objects.order_by().values('user', 'question')
+              .annotate(latest=Max('id')).values('latest'))
+    Vote.objects.exclude(id__in=Subquery(latest)).delete()
+    tally = (Vote.objects.filter(choice=OuterRef('pk'))
+             .order_by().values('choice')
+             .annotate(total=Count('pk')).values('total'))
+    Choice.objects.update(vote_count=Coalesce(Subquery(tally), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_choice_vote_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.RunPython(fill_vote_question, migrations.RunPython.noop),
+    ]
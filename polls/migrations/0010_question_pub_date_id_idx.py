@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_choice_shards'),
+    ]
+
+    # The new index is built before the old one goes, so the index page is
+    # never left without one.
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['pub_date', 'id'], name='question_pub_date_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='question',
+            name='question_pub_date_idx',
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:29
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def checkpoint_votes(apps, schema_editor):
+    """Start the vote log from a checkpoint of the existing votes."""
+    Vote = apps.get_model('polls', 'Vote')
+    TallyCheckpoint = apps.get_model('polls', 'TallyCheckpoint')
+    CheckpointCount = apps.get_model('polls', 'CheckpointCount')
+    checkpoint = TallyCheckpoint.objects.create(last_event_id=0)
+    CheckpointCount.objects.bulk_create(
+        [CheckpointCount(checkpoint=checkpoint, question_id=question_id,
+                         choice_id=choice_id, votes=votes)
+         for question_id, choice_id, votes in
+         Vote.objects.order_by().values_list('question', 'choice')
+         .annotate(votes=Count('pk'))],
+        batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_resultsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TallyCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('user_id', models.BigIntegerField()),
+                ('question_id', models.BigIntegerField()),
+                ('old_choice_id', models.BigIntegerField(null=True)),
+                ('new_choice_id', models.BigIntegerField(null=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question_id', 'id'], name='voteevent_question_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CheckpointCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_id', models.BigIntegerField()),
+                ('choice_id', models.BigIntegerField()),
+                ('votes', models.IntegerField()),
+                ('checkpoint', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='counts', to='polls.tallycheckpoint')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['checkpoint', 'question_id'], name='checkpointcount_question_idx')],
+            },
+        ),
+        migrations.RunPython(checkpoint_votes, migrations.RunPython.noop),
+    ]
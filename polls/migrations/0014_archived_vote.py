@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0013_question_end_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='votes_archived',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ArchivedVote',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('choice', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='polls.choice')),
+                ('question', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'choice'], name='archivedvote_question_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='archivedvote',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='unique_archived_vote_per_question'),
+        ),
+    ]
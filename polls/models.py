@@ -1,36 +1,221 @@
 """Create models for ku-polls."""
+import collections
 import datetime
+import random
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.db.models import (Case, Count, Exists, F, OuterRef, Q, Subquery,
+                              Sum, Value, When, Window)
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 
+class QuestionQuerySet(models.QuerySet):
+    """QuerySet for Question with poll status filters.
+
+    Each filter takes the moment to compare with, so one page can use the
+    same "now" for every query.
+    """
+
+    def published(self, now):
+        """Questions whose pub_date has passed."""
+        return self.filter(pub_date__lte=now)
+
+    def upcoming(self, now):
+        """Questions not published yet."""
+        return self.filter(pub_date__gt=now)
+
+    def open(self, now):
+        """Published questions still taking votes; no end_date never ends."""
+        return self.filter(Q(end_date__isnull=True) | Q(end_date__gte=now),
+                           pub_date__lte=now)
+
+    def closed(self, now):
+        """Questions whose end_date has passed."""
+        return self.filter(end_date__lt=now)
+
+    def with_status(self, now):
+        """Annotate status: Question.UPCOMING, OPEN or CLOSED at now."""
+        return self.annotate(status=Case(
+            When(pub_date__gt=now, then=Value(Question.UPCOMING)),
+            When(end_date__lt=now, then=Value(Question.CLOSED)),
+            default=Value(Question.OPEN),
+            output_field=models.CharField()))
+
+    def before(self, pub_date, pk):
+        """Questions after (pub_date, pk) in newest-first order.
+
+        The pub_date__lte condition lets the (pub_date, id) index seek to
+        the cursor, so every page costs the same.
+        """
+        return self.filter(Q(pub_date__lt=pub_date) | Q(pk__lt=pk),
+                           pub_date__lte=pub_date)
+
+
 class Question(models.Model):
     """Class for create question."""
 
+    UPCOMING = 'upcoming'
+    OPEN = 'open'
+    CLOSED = 'closed'
+
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('end date', null=True)
+    # Goes up whenever the question's counts change; used as its ETag.
+    tally_version = models.PositiveIntegerField(default=0, editable=False)
+    # Above 1, votes are counted on this many ChoiceShard rows per choice.
+    counter_shards = models.PositiveSmallIntegerField(
+        default=1, help_text='Spread vote counters over this many rows on '
+                             'hot polls. Run merge_vote_shards after '
+                             'lowering it back to 1.')
+    # The question's votes are (being) moved to ArchivedVote.
+    votes_archived = models.BooleanField(default=False, editable=False)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # IndexView: pub_date <= now ORDER BY pub_date DESC, and the
+            # archive's keyset pages ORDER BY pub_date DESC, id DESC.
+            models.Index(fields=['pub_date', 'id'],
+                         name='question_pub_date_id_idx'),
+            # Closed questions: end_date < now, in the archive and admin.
+            models.Index(fields=['end_date'], name='question_end_date_idx'),
+        ]
 
     def __str__(self):
         """Return question_text."""
         return self.question_text
 
-    def was_published_recently(self):
+    def was_published_recently(self, now=None):
         """Check was published recently method."""
-        now = timezone.now()
+        now = now or timezone.now()
         return now - datetime.timedelta(days=1) <= self.pub_date <= now
 
-    def is_published(self):
+    def is_published(self, now=None):
         """Check the question is ready to vote."""
-        now = timezone.now()
+        now = now or timezone.now()
         return now >= self.pub_date
 
-    def can_vote(self):
-        """Check the question is in vote time."""
-        now = timezone.now()
-        return self.pub_date <= now <= self.end_date
+    def can_vote(self, now=None):
+        """Check the question is in vote time; no end_date never ends."""
+        return self.get_status(now) == self.OPEN
+
+    def get_status(self, now=None):
+        """Return UPCOMING, OPEN or CLOSED, as with_status() does in SQL."""
+        now = now or timezone.now()
+        if self.pub_date > now:
+            return self.UPCOMING
+        if self.end_date is not None and self.end_date < now:
+            return self.CLOSED
+        return self.OPEN
+
+
+def group_by_amount(deltas):
+    """Return {amount: [choice ids]} for the non-zero {choice id: amount}."""
+    by_amount = collections.defaultdict(list)
+    for choice_id, amount in deltas.items():
+        if amount:
+            by_amount[amount].append(choice_id)
+    return by_amount
+
+
+class ChoiceQuerySet(models.QuerySet):
+    """QuerySet for Choice with vote counter helpers."""
+
+    def add_votes(self, amount):
+        """Atomically add amount to the vote counter of every choice."""
+        return self.update(vote_count=F('vote_count') + amount)
+
+    def move_votes(self, deltas):
+        """Apply counter changes given as {choice id: amount}.
+
+        Choices are updated with one statement per distinct amount. Choices
+        of questions with counter_shards above 1 get their amount on a
+        random shard instead, so concurrent voters do not queue on one row.
+        """
+        by_amount = group_by_amount(deltas)
+        moved = 0
+        for amount, choice_ids in by_amount.items():
+            moved += self.filter(pk__in=choice_ids,
+                                 question__counter_shards__lte=1
+                                 ).add_votes(amount)
+        if moved == sum(len(ids) for ids in by_amount.values()):
+            return
+        sharded = (self.filter(pk__in=[pk for ids in by_amount.values()
+                                       for pk in ids],
+                               question__counter_shards__gt=1)
+                   .values_list('pk', 'question__counter_shards'))
+        for choice_id, shards in sharded:
+            ChoiceShard.objects.add_votes(choice_id, random.randrange(shards),
+                                          deltas[choice_id])
+
+    def recount_votes(self):
+        """Rebuild the vote counter of every choice from the vote tables.
+
+        Votes moved to ArchivedVote are counted too.
+        """
+        tally = (Vote.objects.filter(choice=OuterRef('pk'))
+                 .order_by().values('choice')
+                 .annotate(total=Count('pk')).values('total'))
+        archived = (ArchivedVote.objects
+                    .filter(question=OuterRef('question_id'),
+                            choice=OuterRef('pk'))
+                    .order_by().values('choice')
+                    .annotate(total=Count('pk')).values('total'))
+        Question.objects.filter(pk__in=self.values('question_id')).update(
+            tally_version=F('tally_version') + 1)
+        ChoiceShard.objects.filter(choice__in=self.values('pk')).delete()
+        return self.update(vote_count=Coalesce(Subquery(tally), 0)
+                           + Coalesce(Subquery(archived), 0))
+
+    def replay_votes(self):
+        """Rebuild the vote counter of every choice from the vote log.
+
+        Counts start from the last TallyCheckpoint and add the events after
+        it, so this reads the recent events instead of the Vote table.
+        """
+        question_ids = list(self.values_list('question_id', flat=True)
+                            .distinct())
+        tallies = VoteEvent.objects.tallies(question_ids)
+        choice_ids = list(self.values_list('pk', flat=True))
+        by_count = collections.defaultdict(list)
+        for choice_id in choice_ids:
+            by_count[tallies.get(choice_id, 0)].append(choice_id)
+        Question.objects.filter(pk__in=question_ids).update(
+            tally_version=F('tally_version') + 1)
+        ChoiceShard.objects.filter(choice_id__in=choice_ids).delete()
+        for count, ids in by_count.items():
+            Choice.objects.filter(pk__in=ids).update(vote_count=count)
+        return len(choice_ids)
+
+    def with_shard_votes(self):
+        """Annotate shard_votes, the votes not yet merged from the shards.
+
+        The shards are only summed for questions with counter_shards above
+        1; other choices get 0 without touching the shard table.
+        """
+        pending = (ChoiceShard.objects.filter(choice=OuterRef('pk'))
+                   .order_by().values('choice')
+                   .annotate(total=Sum('count')).values('total'))
+        return self.annotate(shard_votes=Case(
+            When(question__counter_shards__gt=1,
+                 then=Coalesce(Subquery(pending), 0)),
+            default=0))
+
+    def with_results(self):
+        """Load each choice with its question and the question's vote total.
+
+        The total is computed with a window over the question, so a whole
+        results page comes from a single query.
+        """
+        total = Window(Sum(F('vote_count') + F('shard_votes')),
+                       partition_by=[F('question_id')])
+        return (self.select_related('question').with_shard_votes()
+                .annotate(total_votes=total).order_by('pk'))
 
 
 class Choice(models.Model):
@@ -38,6 +223,9 @@ class Choice(models.Model):
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.IntegerField(default=0)
+
+    objects = ChoiceQuerySet.as_manager()
 
     def __str__(self):
         """Return choice text."""
@@ -45,16 +233,503 @@ class Choice(models.Model):
 
     @property
     def votes(self):
-        count = Vote.objects.filter(choice=self).count()
-        return count
+        """Return the number of votes for this choice.
+
+        Votes still on the shards are only included when the choice was
+        loaded with_shard_votes().
+        """
+        return self.vote_count + getattr(self, 'shard_votes', 0)
+
+    @property
+    def percent(self):
+        """Return this choice's share of the question's votes."""
+        total = getattr(self, 'total_votes', None)
+        if not total:
+            return 0.0
+        return round(100 * self.votes / total, 1)
+
+
+class ResultSnapshot(models.Model):
+    """Final results of a closed question (see polls/snapshots.py)."""
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE,
+                                    primary_key=True, related_name='snapshot')
+    # The question's end_date when frozen; the snapshot is stale otherwise.
+    end_date = models.DateTimeField()
+    total = models.IntegerField()
+    # [{'id', 'choice_text', 'votes', 'percent'}, ...] in results order.
+    choices = models.JSONField()
+    html = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Results of {self.question}"
+
+
+class ChoiceShardQuerySet(models.QuerySet):
+    """QuerySet for ChoiceShard with the sharded counter helpers."""
+
+    def add_votes(self, choice_id, shard, amount):
+        """Atomically add amount to one shard, creating it when missing."""
+        rows = self.filter(choice_id=choice_id, shard=shard)
+        if not rows.update(count=F('count') + amount):
+            self.bulk_create([ChoiceShard(choice_id=choice_id, shard=shard)],
+                             ignore_conflicts=True)
+            rows.update(count=F('count') + amount)
+
+    def merge(self):
+        """Move the shard counts into Choice.vote_count.
+
+        Each shard is lowered by the amount read from it rather than reset,
+        so votes landing on it meanwhile are kept. Return the number of
+        shards merged.
+        """
+        with transaction.atomic():
+            rows = list(self.select_for_update().exclude(count=0)
+                        .values_list('pk', 'choice_id', 'count'))
+            if not rows:
+                return 0
+            deltas = collections.Counter()
+            for pk, choice_id, count in rows:
+                self.filter(pk=pk).update(count=F('count') - count)
+                deltas[choice_id] += count
+            for amount, choice_ids in group_by_amount(deltas).items():
+                Choice.objects.filter(pk__in=choice_ids).add_votes(amount)
+            Question.objects.filter(
+                choice__pk__in=list(deltas)
+            ).update(tally_version=F('tally_version') + 1)
+        return len(rows)
+
+
+class ChoiceShard(models.Model):
+    """Part of a choice's vote counter on a Question with counter_shards."""
+
+    # Served by the (choice, shard) constraint below.
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE,
+                               related_name='shards', db_index=False)
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    objects = ChoiceShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'],
+                                    name='unique_shard_per_choice'),
+        ]
+
+
+class VoteQuerySet(models.QuerySet):
+    """QuerySet for Vote with the voting write path."""
+
+    def cast(self, user, choice):
+        """Record a user's vote for a choice and return the previous choice id.
+
+        The vote row is written by one insert-or-update statement on the
+        (user, question) constraint. The previous choice is read under a
+        lock on the user first so the counters move in the same transaction.
+        """
+        key = (user.pk, choice.question_id)
+        return self.cast_many({key: choice.pk}).get(key)
+
+    def cast_many(self, ballots):
+        """Record many votes at once and return the previous choice ids.
+
+        ballots maps (user id, question id) to the chosen choice id. All
+        votes go out in batched upserts and the counters are moved with one
+        update per distinct change, whatever the number of votes.
+        """
+        with transaction.atomic():
+            users = {user_id for user_id, _ in ballots}
+            questions = {question_id for _, question_id in ballots}
+            # A first vote has no row to lock yet, so lock the voters: two
+            # concurrent first votes of one user would both count as new.
+            list(User.objects.select_for_update().filter(pk__in=users)
+                 .order_by('pk').values_list('pk', flat=True))
+            rows = (self.select_for_update()
+                    .filter(user_id__in=users, question_id__in=questions)
+                    .values_list('user_id', 'question_id', 'choice_id'))
+            previous = {(user_id, question_id): choice_id
+                        for user_id, question_id, choice_id in rows
+                        if (user_id, question_id) in ballots}
+            changed = {key: choice_id for key, choice_id in ballots.items()
+                       if previous.get(key) != choice_id}
+            if not changed:
+                return previous
+            self.bulk_create([Vote(user_id=user_id, question_id=question_id,
+                                   choice_id=choice_id)
+                              for (user_id, question_id), choice_id
+                              in changed.items()],
+                             update_conflicts=True,
+                             unique_fields=['user', 'question'],
+                             update_fields=['choice'])
+            VoteEvent.objects.bulk_create(
+                [VoteEvent(user_id=user_id, question_id=question_id,
+                           old_choice_id=previous.get((user_id, question_id)),
+                           new_choice_id=choice_id)
+                 for (user_id, question_id), choice_id in changed.items()])
+            deltas = collections.Counter()
+            for key, choice_id in changed.items():
+                deltas[choice_id] += 1
+                if key in previous:
+                    deltas[previous[key]] -= 1
+            Choice.objects.move_votes(deltas)
+            # Sharded questions get a new version when their shards merge,
+            # so votes do not all queue on the question row.
+            Question.objects.filter(
+                pk__in={question_id for _, question_id in changed},
+                counter_shards__lte=1,
+            ).update(tally_version=F('tally_version') + 1)
+        return previous
 
 
 class Vote(models.Model):
     """Represents a vote made by a user."""
 
     id = models.AutoField(primary_key=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=False, blank=False)
+    # The user and question lookups are served by the composite indexes
+    # below, so these foreign keys get no index of their own.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=False,
+                             blank=False, db_index=False)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE,
+                                 editable=False, db_index=False)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
 
+    objects = VoteQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # get_vote_for_user and cast: user = ? AND question = ?.
+            models.UniqueConstraint(fields=['user', 'question'],
+                                    name='unique_vote_per_question'),
+        ]
+        indexes = [
+            # Tallies: question = ? GROUP BY choice.
+            models.Index(fields=['question', 'choice'],
+                         name='vote_question_choice_idx'),
+        ]
+
     def __str__(self):
         return f"Voted by {self.user.username} for {self.choice.choice_text}"
+
+    def save(self, *args, **kwargs):
+        """Keep the stored question in line with the choice."""
+        self.question_id = self.choice.question_id
+        super().save(*args, **kwargs)
+
+
+class VoteEventQuerySet(models.QuerySet):
+    """QuerySet for VoteEvent with replay and compaction."""
+
+    def tallies(self, question_ids=None):
+        """Return {choice id: votes} from the last checkpoint and later events.
+
+        With question_ids, only the choices of those questions.
+        """
+        checkpoint = TallyCheckpoint.objects.order_by('-last_event_id').first()
+        counts = CheckpointCount.objects.filter(checkpoint=checkpoint)
+        events = self.filter(pk__gt=checkpoint.last_event_id
+                             if checkpoint else 0)
+        if question_ids is not None:
+            counts = counts.filter(question_id__in=question_ids)
+            events = events.filter(question_id__in=question_ids)
+        tallies = collections.Counter(dict(
+            counts.values_list('choice_id', 'votes')))
+        for field, sign in (('new_choice_id', 1), ('old_choice_id', -1)):
+            for choice_id, total in (events.exclude(**{field: None})
+                                     .order_by().values_list(field)
+                                     .annotate(total=Count('pk'))):
+                tallies[choice_id] += sign * total
+        return tallies
+
+    def compact(self, before):
+        """Fold the events created before a moment into a new checkpoint.
+
+        The folded events and older checkpoints are deleted. Only fold
+        events old enough that no transaction writing them can still be
+        open, as ids may commit out of order. Return the number folded.
+        """
+        with transaction.atomic():
+            last_event_id = (self.filter(created__lt=before)
+                             .aggregate(last=models.Max('pk'))['last'])
+            if last_event_id is None:
+                return 0
+            folded = self.filter(pk__lte=last_event_id)
+            checkpoint = (TallyCheckpoint.objects.order_by('-last_event_id')
+                          .first())
+            if checkpoint and checkpoint.last_event_id >= last_event_id:
+                # Already counted, e.g. by TallyCheckpoint.from_votes().
+                return folded.delete()[0]
+            tallies = folded.tallies()
+            TallyCheckpoint.objects.all().delete()
+            TallyCheckpoint.objects.save_counts(last_event_id, tallies)
+            return folded.delete()[0]
+
+
+class VoteEvent(models.Model):
+    """One change of a user's vote, appended by Vote.objects.cast_many.
+
+    old_choice_id is None for a first vote and new_choice_id for a deleted
+    vote. Ids are plain columns, so the log outlives deleted rows.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    user_id = models.BigIntegerField()
+    question_id = models.BigIntegerField()
+    old_choice_id = models.BigIntegerField(null=True)
+    new_choice_id = models.BigIntegerField(null=True)
+    created = models.DateTimeField(default=timezone.now)
+
+    objects = VoteEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Replaying one question: question = ? AND id > checkpoint.
+            models.Index(fields=['question_id', 'id'],
+                         name='voteevent_question_id_idx'),
+        ]
+
+    def __str__(self):
+        return (f"User {self.user_id}: {self.old_choice_id} -> "
+                f"{self.new_choice_id}")
+
+
+class TallyCheckpointQuerySet(models.QuerySet):
+    """QuerySet for TallyCheckpoint."""
+
+    def save_counts(self, last_event_id, tallies):
+        """Store {choice id: votes} as the checkpoint at last_event_id."""
+        questions = dict(Choice.objects.filter(pk__in=list(tallies))
+                         .values_list('pk', 'question_id'))
+        checkpoint = self.create(last_event_id=last_event_id)
+        CheckpointCount.objects.bulk_create(
+            [CheckpointCount(checkpoint=checkpoint, choice_id=choice_id,
+                             question_id=questions[choice_id], votes=votes)
+             for choice_id, votes in tallies.items()
+             if votes and choice_id in questions],
+            batch_size=2000)
+        return checkpoint
+
+    def from_votes(self):
+        """Take a checkpoint of the Vote table at the newest event.
+
+        For writes that bypass the log, such as imports.
+        """
+        with transaction.atomic():
+            last_event_id = (VoteEvent.objects
+                             .aggregate(last=models.Max('pk'))['last'] or 0)
+            tallies = collections.Counter(dict(
+                Vote.objects.order_by().values_list('choice')
+                .annotate(total=Count('pk'))))
+            tallies.update(dict(
+                ArchivedVote.objects.order_by().values_list('choice')
+                .annotate(total=Count('pk'))))
+            self.all().delete()
+            return self.save_counts(last_event_id, tallies)
+
+
+class TallyCheckpoint(models.Model):
+    """Vote counts folded from the log up to and including last_event_id."""
+
+    last_event_id = models.BigIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    objects = TallyCheckpointQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Checkpoint at event {self.last_event_id}"
+
+
+class CheckpointCount(models.Model):
+    """Votes of one choice in a TallyCheckpoint."""
+
+    checkpoint = models.ForeignKey(TallyCheckpoint, on_delete=models.CASCADE,
+                                   related_name='counts', db_index=False)
+    question_id = models.BigIntegerField()
+    choice_id = models.BigIntegerField()
+    votes = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['checkpoint', 'question_id'],
+                         name='checkpointcount_question_idx'),
+        ]
+
+
+class ArchivedVoteQuerySet(models.QuerySet):
+    """QuerySet for ArchivedVote with the moves to and from Vote."""
+
+    def archive(self, before, batch_size=1000):
+        """Move the votes of questions closed before a moment to the archive.
+
+        Each question is marked votes_archived first, then its votes are
+        moved batch_size at a time, each batch in its own transaction, so
+        the Vote table is never locked for long. Marked questions still
+        holding votes, left by an interrupted run, are picked up again.
+        Questions whose end_date moves later must be restored before taking
+        votes again. Return the number of questions and of votes moved.
+        """
+        left = Vote.objects.filter(question=OuterRef('pk'))
+        questions = Question.objects.closed(before).filter(
+            Q(votes_archived=False) | Exists(left))
+        question_ids = list(questions.values_list('pk', flat=True))
+        Question.objects.filter(pk__in=question_ids).update(
+            votes_archived=True)
+        moved = 0
+        for question_id in question_ids:
+            moved += relocate_votes(
+                Vote.objects.filter(question_id=question_id), self,
+                ArchivedVote, batch_size)
+        return len(question_ids), moved
+
+    def restore(self, question_ids, batch_size=1000):
+        """Move the votes of archived questions back to the Vote table.
+
+        Questions not archived are skipped. Return the number of votes
+        moved.
+        """
+        question_ids = list(Question.objects.filter(
+            pk__in=question_ids, votes_archived=True
+        ).values_list('pk', flat=True))
+        moved = 0
+        for question_id in question_ids:
+            moved += relocate_votes(
+                self.filter(question_id=question_id), Vote.objects, Vote,
+                batch_size)
+        Question.objects.filter(pk__in=question_ids).update(
+            votes_archived=False)
+        return moved
+
+    def tallies(self, question_ids):
+        """Return {choice id: votes} of the archived questions given."""
+        return dict(self.filter(question_id__in=question_ids)
+                    .order_by().values_list('choice')
+                    .annotate(total=Count('pk')))
+
+
+def relocate_votes(votes, target, model, batch_size):
+    """Copy votes into another table and delete them, a batch at a time.
+
+    Rows keep their ids. Neither table has delete signals, so a moved vote
+    is not logged as a vote change. Return the number moved.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(votes.order_by('pk').values_list(
+                'pk', 'user_id', 'question_id', 'choice_id')[:batch_size])
+            if not rows:
+                return moved
+            target.bulk_create([model(pk=pk, user_id=user_id,
+                                      question_id=question_id,
+                                      choice_id=choice_id)
+                                for pk, user_id, question_id, choice_id
+                                in rows])
+            votes.model.objects.filter(
+                pk__in=[row[0] for row in rows]).delete()
+        moved += len(rows)
+
+
+class ArchivedVote(models.Model):
+    """A vote of a long closed question, moved out of the Vote table.
+
+    Same columns and ids as Vote; see ArchivedVoteQuerySet.archive.
+    """
+
+    id = models.IntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE,
+                                 db_index=False)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE,
+                               db_index=False)
+
+    objects = ArchivedVoteQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'],
+                                    name='unique_archived_vote_per_question'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'choice'],
+                         name='archivedvote_question_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived vote {self.pk} for choice {self.choice_id}"
+
+
+# Rows of the vote log written per insert when logging removed votes.
+LOG_BATCH = 2000
+
+
+def remove_votes(votes):
+    """Log and uncount votes that are about to be deleted.
+
+    The work is a fixed number of queries plus one insert per LOG_BATCH
+    votes, whatever the number of votes.
+    """
+    rows = votes.order_by().values_list('user_id', 'question_id',
+                                        'choice_id')
+    batch = []
+    for user_id, question_id, choice_id in rows.iterator(
+            chunk_size=LOG_BATCH):
+        batch.append(VoteEvent(user_id=user_id, question_id=question_id,
+                               old_choice_id=choice_id))
+        if len(batch) >= LOG_BATCH:
+            VoteEvent.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        VoteEvent.objects.bulk_create(batch)
+    counts = votes.order_by().values_list('choice').annotate(
+        total=Count('pk'))
+    Choice.objects.move_votes({choice_id: -total
+                               for choice_id, total in counts})
+    Question.objects.filter(
+        pk__in=votes.order_by().values('question_id'), counter_shards__lte=1
+    ).update(tally_version=F('tally_version') + 1)
+
+
+def remove_user_votes(sender, instance, **kwargs):
+    """Log and uncount the votes of a user being deleted."""
+    remove_votes(Vote.objects.filter(user_id=instance.pk))
+
+
+def remove_choice_votes(sender, instance, **kwargs):
+    """Log the votes of a choice being deleted, e.g. with its question."""
+    remove_votes(Vote.objects.filter(choice_id=instance.pk))
+
+
+# Handled on the deleted parents rather than per Vote, so a cascade keeps
+# deleting votes with a single statement instead of loading each one.
+pre_delete.connect(remove_user_votes, sender=User,
+                   dispatch_uid='polls_remove_user_votes')
+pre_delete.connect(remove_choice_votes, sender=Choice,
+                   dispatch_uid='polls_remove_choice_votes')
+
+
+def bump_tally_version(sender, instance, **kwargs):
+    """Give a question a new results ETag when one of its choices changes."""
+    Question.objects.filter(pk=instance.question_id).update(
+        tally_version=F('tally_version') + 1)
+
+
+def bump_question_version(sender, instance, raw=False, **kwargs):
+    """Give an edited question a new results ETag.
+
+    The saved instance is refreshed so a later save() does not write the
+    old version back.
+    """
+    if raw:
+        return
+    Question.objects.filter(pk=instance.pk).update(
+        tally_version=F('tally_version') + 1)
+    instance.refresh_from_db(fields=['tally_version'])
+
+
+post_save.connect(bump_question_version, sender=Question,
+                  dispatch_uid='polls_bump_question_version')
+post_save.connect(bump_tally_version, sender=Choice,
+                  dispatch_uid='polls_bump_tally_version_on_save')
+post_delete.connect(bump_tally_version, sender=Choice,
+                    dispatch_uid='polls_bump_tally_version_on_delete')
@@ -0,0 +1,51 @@
+"""Storage of request profiles written by ProfilingMiddleware.
+
+Each profile is a cProfile .prof file named <us>-<queries>q-<view>.prof, so
+it can be picked by view without being opened. The directory is kept under
+PROFILE_MAX_BYTES by deleting the oldest profiles first.
+"""
+import os
+import re
+import time
+
+SUFFIX = '.prof'
+
+
+def profile_path(directory, view, queries):
+    """Return a new file path for a profile of the given view."""
+    view = re.sub(r'[^A-Za-z0-9_.]', '.', view)
+    return os.path.join(directory,
+                        f'{time.time_ns() // 1000}-{queries}q-{view}{SUFFIX}')
+
+
+def profile_view(path):
+    """Return the view name stored in a profile's file name."""
+    return os.path.basename(path)[:-len(SUFFIX)].split('-', 2)[2]
+
+
+def list_profiles(directory, view=None):
+    """Return the profile paths in the directory, oldest first.
+
+    With a view, only profiles of that view; ':' in URL names is written as
+    '.' in file names, and either may be given.
+    """
+    if not os.path.isdir(directory):
+        return []
+    paths = sorted(os.path.join(directory, name)
+                   for name in os.listdir(directory) if name.endswith(SUFFIX))
+    if view is not None:
+        view = view.replace(':', '.')
+        paths = [path for path in paths if profile_view(path) == view]
+    return paths
+
+
+def rotate(directory, max_bytes):
+    """Delete the oldest profiles until the directory fits in max_bytes."""
+    paths = list_profiles(directory)
+    sizes = [os.path.getsize(path) for path in paths]
+    total = sum(sizes)
+    for path, size in zip(paths, sizes):
+        if total <= max_bytes:
+            break
+        os.unlink(path)
+        total -= size
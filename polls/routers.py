@@ -0,0 +1,85 @@
+"""Send reads of chosen views to read replicas, everything else to default.
+
+Only views wrapped in replica_reads() read from a replica, picked at random
+from DATABASE_REPLICAS. Writes always go to the primary, the default
+database. Once a request writes, its later reads use the primary too, and
+ReplicaMiddleware keeps the client on the primary for
+REPLICA_STICKY_SECONDS so voters see their own vote before the replicas
+catch up.
+"""
+import contextvars
+import functools
+import random
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+current_request = contextvars.ContextVar('polls_db_request', default=None)
+
+
+class RequestRouting:
+    """Database choices of one request."""
+
+    def __init__(self, sticky=False):
+        self.sticky = sticky
+        self.use_replica = False
+        self.wrote = False
+
+
+def replica_reads(view):
+    """Let a view's reads go to a replica, unless the client is sticky.
+
+    The flag is left on until the request ends, so querysets evaluated
+    while a TemplateResponse renders use the replica too.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            allow_replica()
+            return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            allow_replica()
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def allow_replica():
+    """Mark the current request's reads as safe to serve from a replica."""
+    routing = current_request.get()
+    if routing is not None:
+        routing.use_replica = True
+
+
+class PrimaryReplicaRouter:
+    """Database router for one primary and any number of replicas."""
+
+    def db_for_read(self, model, **hints):
+        """Return a random replica for replica-safe requests."""
+        routing = current_request.get()
+        if (routing is None or not routing.use_replica or routing.sticky
+                or routing.wrote or not settings.DATABASE_REPLICAS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        """Return the primary, and keep this request's reads on it."""
+        routing = current_request.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations between rows of the primary and its replicas."""
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Only migrate the primary; replicas copy its schema."""
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,77 @@
+"""Frozen results of closed questions.
+
+Once a question's end_date has passed, its counts no longer change. The
+first results request after that stores them in a ResultSnapshot together
+with the rendered results table, and later requests and the JSON results
+are served from it. A snapshot only holds while the question keeps the
+end_date it was frozen at; moving the end_date makes it stale. Historical
+questions are frozen with the snapshot_results command.
+
+Snapshots are taken SNAPSHOT_GRACE_SECONDS after the end_date, once votes
+accepted just before it have left the vote buffers of every process, and
+are counted from the primary database, never from a lagging replica.
+"""
+import datetime
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from .buffer import get_vote_buffer
+from .models import Choice, Question, ResultSnapshot
+
+
+def current_snapshot(question):
+    """Return the question's snapshot, or None if missing or stale."""
+    try:
+        snapshot = question.snapshot
+    except ResultSnapshot.DoesNotExist:
+        return None
+    if snapshot.end_date != question.end_date:
+        return None
+    return snapshot
+
+
+def snapshot_for(question, now):
+    """Return the question's snapshot, freezing it if it just closed.
+
+    Return None while the question is not closed or still in its grace
+    period.
+    """
+    snapshot = current_snapshot(question)
+    if snapshot is None and can_freeze(question, now):
+        snapshot = freeze(question)
+    return snapshot
+
+
+def can_freeze(question, now):
+    """Return whether the question closed more than the grace period ago."""
+    grace = datetime.timedelta(seconds=settings.SNAPSHOT_GRACE_SECONDS)
+    return (question.get_status(now) == Question.CLOSED
+            and question.end_date + grace <= now)
+
+
+def freeze(question):
+    """Store the results of a closed question and return the snapshot.
+
+    Votes queued in this process are written first.
+    """
+    buffer = get_vote_buffer()
+    if buffer is not None:
+        buffer.flush()
+    choices = list(Choice.objects.using('default')
+                   .filter(question_id=question.pk).with_results())
+    total = choices[0].total_votes if choices else 0
+    snapshot, _ = ResultSnapshot.objects.update_or_create(
+        question=question,
+        defaults={
+            'end_date': question.end_date,
+            'total': total,
+            'choices': [{'id': choice.pk, 'choice_text': choice.choice_text,
+                         'votes': choice.votes, 'percent': choice.percent}
+                        for choice in choices],
+            'html': render_to_string('polls/results_table.html',
+                                     {'choices': choices,
+                                      'total_votes': total}),
+        })
+    question.snapshot = snapshot
+    return snapshot
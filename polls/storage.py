@@ -0,0 +1,64 @@
+"""Static files storage writing hashed and precompressed copies.
+
+collectstatic stores every file under a content-hashed name as well, e.g.
+polls/style.4f3c9a1b2d7e.css, and records the mapping in staticfiles.json.
+Text files then get a .gz copy, and a .br copy when the brotli package is
+installed, which StaticFilesMiddleware sends to clients that accept them.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import (ManifestStaticFilesStorage,
+                                                StaticFilesStorage)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_EXTENSIONS = {'.css', '.js', '.svg', '.html', '.txt', '.json',
+                       '.map', '.xml', '.ico'}
+
+# A compressed copy saving fewer bytes than this is not written.
+MIN_SAVING = 64
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes .gz and .br copies."""
+
+    def url(self, name, force=False):
+        """Use the plain name until collectstatic has written the manifest."""
+        if not self.hashed_files:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Hash the files, then compress the originals and hashed copies."""
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                names.add(name)
+                if hashed_name:
+                    names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in COMPRESS_EXTENSIONS:
+                self.compress(self.path(name))
+
+    def compress(self, path):
+        """Write the gzip and brotli copies of a file next to it."""
+        with open(path, 'rb') as f:
+            content = f.read()
+        encoders = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            encoders.append(('.br', brotli.compress))
+        for suffix, encode in encoders:
+            compressed = encode(content)
+            if len(compressed) + MIN_SAVING <= len(content):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
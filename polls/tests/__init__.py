@@ -2,3 +2,17 @@
 
 from .auth_tests import *
 from .question_tests import *
+from .vote_tests import *
+from .buffer_tests import *
+from .async_tests import *
+from .query_plan_tests import *
+from .transfer_tests import *
+from .metrics_tests import *
+from .profiling_tests import *
+from .router_tests import *
+from .archive_tests import *
+from .snapshot_tests import *
+from .throttle_tests import *
+from .static_tests import *
+from .admin_tests import *
+from .vote_archive_tests import *
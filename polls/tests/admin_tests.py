@@ -0,0 +1,117 @@
+"""Tests for the admin changelists."""
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Question, Vote
+
+
+class AdminChangelistTests(TestCase):
+    """Changelist pages cost the same number of queries for any page size."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", password="Fat-Chance!")
+        self.client.force_login(self.admin)
+        now = timezone.now()
+        self.open = Question.objects.create(
+            question_text="Open poll", pub_date=now - datetime.timedelta(1))
+        self.closed = Question.objects.create(
+            question_text="Closed poll", pub_date=now - datetime.timedelta(3),
+            end_date=now - datetime.timedelta(2))
+        self.yes = self.open.choice_set.create(choice_text="yes",
+                                               vote_count=2)
+        self.open.choice_set.create(choice_text="no", vote_count=1)
+        self.late = self.closed.choice_set.create(choice_text="late",
+                                                  vote_count=4)
+
+    def add_votes(self, count):
+        """Add count voters, half on each question."""
+        start = User.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create_user(username=f"voter{i}")
+            choice = self.yes if i % 2 else self.late
+            Vote.objects.create(user=user, choice=choice)
+
+    def count_queries(self, url):
+        """Return the queries run to render url once the user is cached."""
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_vote_list_does_not_grow_with_rows(self):
+        """Users, questions and choices are joined in, not loaded per row."""
+        url = reverse('admin:polls_vote_changelist')
+        self.add_votes(2)
+        few = self.count_queries(url)
+        self.add_votes(20)
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_choice_list_does_not_grow_with_rows(self):
+        """Questions are joined in."""
+        url = reverse('admin:polls_choice_changelist')
+        few = self.count_queries(url)
+        for i in range(10):
+            self.closed.choice_set.create(choice_text=f"extra {i}")
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_question_list_annotations(self):
+        """Questions show their status and vote total."""
+        response = self.client.get(reverse('admin:polls_question_changelist'))
+        rows = {q.pk: q for q in response.context['cl'].result_list}
+        self.assertEqual(rows[self.open.pk].status, Question.OPEN)
+        self.assertEqual(rows[self.open.pk].total_votes, 3)
+        self.assertEqual(rows[self.closed.pk].status, Question.CLOSED)
+        self.assertEqual(rows[self.closed.pk].total_votes, 4)
+
+    def test_status_filters(self):
+        """Questions, choices and votes filter by question status."""
+        self.add_votes(2)
+        cases = [('question', [self.closed.pk]),
+                 ('choice', [self.late.pk]),
+                 ('vote', list(Vote.objects.filter(choice=self.late)
+                               .values_list('pk', flat=True)))]
+        for model, expected in cases:
+            response = self.client.get(
+                reverse(f'admin:polls_{model}_changelist'),
+                {'status': Question.CLOSED})
+            self.assertEqual(
+                [row.pk for row in response.context['cl'].result_list],
+                expected, model)
+
+    def test_raw_id_widgets(self):
+        """The choice form does not list every question."""
+        response = self.client.get(
+            reverse('admin:polls_choice_change', args=(self.yes.pk,)))
+        self.assertContains(response, 'vForeignKeyRawIdAdminField', count=1)
+
+    def test_votes_are_read_only(self):
+        """Votes can be viewed but not added, changed or deleted."""
+        self.add_votes(1)
+        vote = Vote.objects.get()
+        response = self.client.get(
+            reverse('admin:polls_vote_change', args=(vote.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, '<select')
+        response = self.client.post(
+            reverse('admin:polls_vote_change', args=(vote.pk,)),
+            {'user': vote.user_id, 'choice': self.late.pk})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse('admin:polls_vote_add')).status_code,
+            403)
+        response = self.client.post(
+            reverse('admin:polls_vote_delete', args=(vote.pk,)),
+            {'post': 'yes'})
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Vote.objects.filter(pk=vote.pk).exists())
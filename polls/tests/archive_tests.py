@@ -0,0 +1,78 @@
+"""Tests for the keyset-paginated poll archive."""
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Question
+from ..views import ARCHIVE_PAGE_SIZE
+
+
+class ArchiveViewTests(TestCase):
+    """Pages follow each other by cursor, with status filters in SQL."""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('polls:archive')
+        now = timezone.now()
+        # Pairs of questions share a pub_date to exercise the id tiebreak.
+        self.questions = Question.objects.bulk_create(
+            [Question(question_text=f"Poll {number}",
+                      pub_date=now - datetime.timedelta(days=1 + number // 2),
+                      end_date=(now - datetime.timedelta(hours=1)
+                                if number % 3 == 0 else None))
+             for number in range(2 * ARCHIVE_PAGE_SIZE + 5)])
+        self.upcoming = Question.objects.create(
+            question_text="Upcoming poll",
+            pub_date=now + datetime.timedelta(days=1))
+
+    def walk(self, status):
+        """Return the ids of every page of a status, checking query counts."""
+        ids = []
+        params = {'status': status}
+        while True:
+            with self.assertNumQueries(1):
+                response = self.client.get(self.url, params)
+            ids.extend(question.id for question in
+                       response.context['questions'])
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                return ids
+            params['after'] = cursor
+
+    def test_pages_cover_every_poll_once(self):
+        """All published polls come once, newest first."""
+        ids = self.walk('all')
+        expected = list(Question.objects.filter(pub_date__lte=timezone.now())
+                        .order_by('-pub_date', '-pk')
+                        .values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_status_filters(self):
+        """open and closed split the published polls by end_date."""
+        closed = self.walk('closed')
+        opened = self.walk('open')
+        self.assertEqual(len(closed), len([question for question in
+                                           self.questions
+                                           if question.end_date]))
+        self.assertEqual(sorted(closed + opened),
+                         sorted(question.id for question in self.questions))
+
+    def test_upcoming_only_for_staff(self):
+        """Unpublished polls are hidden from other users."""
+        self.assertNotIn(self.upcoming.id, self.walk('all'))
+        self.assertEqual(
+            self.client.get(self.url, {'status': 'upcoming'}).status_code, 404)
+        staff = User.objects.create_user(username="staff", password="x",
+                                         is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(self.url, {'status': 'upcoming'})
+        self.assertEqual(list(response.context['questions']), [self.upcoming])
+
+    def test_invalid_cursor(self):
+        """A mangled cursor is a 404."""
+        response = self.client.get(self.url, {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,128 @@
+"""Tests for the async views served through ASGI."""
+
+import datetime
+import json
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Choice, Question, Vote
+from .question_tests import create_question
+
+
+@override_settings(ROOT_URLCONF='kupolls.async_urls')
+class AsyncViewTests(TestCase):
+    """The async index, results and vote views behave like the sync ones."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="Fat-Chance!")
+        self.question = create_question(question_text="Async question",
+                                        days=-1)
+        self.choice = self.question.choice_set.create(choice_text="yes")
+
+    async def test_index(self):
+        """The index lists published questions."""
+        await sync_to_async(create_question)("Future question", 5)
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertEqual(list(response.context['latest_question_list']),
+                         [self.question])
+
+    async def test_results(self):
+        """The results page shows the stored counts."""
+        response = await self.async_client.get(
+            reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, "Async question")
+        self.assertEqual(response.context['total_votes'], 0)
+
+    async def test_results_missing_question(self):
+        """An unknown question id is a 404."""
+        response = await self.async_client.get(
+            reverse('polls:results', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_vote_requires_login(self):
+        """Anonymous votes are sent to the login page."""
+        response = await self.async_client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response.url)
+
+    async def test_vote(self):
+        """A logged in vote is stored and counted."""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            {'choice': self.choice.id})
+        self.assertRedirects(response, reverse('polls:results',
+                                               args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        vote = await Vote.objects.select_related('choice').aget()
+        self.assertEqual(vote.choice.votes, 1)
+
+
+class CompareServersCommandTests(TestCase):
+    """The compare_servers command reports both modes."""
+
+    def test_reports_wsgi_and_asgi(self):
+        """One line is printed per mode."""
+        out = StringIO()
+        call_command('compare_servers', '/polls/', requests=4, concurrency=1,
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]],
+                         ['wsgi', 'asgi'])
+
+
+@override_settings(ROOT_URLCONF='kupolls.async_urls',
+                   POLLS_STREAM_INTERVAL=0.05)
+class ResultsStreamTests(TestCase):
+    """The live results stream pushes changed counts until the poll ends."""
+
+    def setUp(self):
+        super().setUp()
+        self.question = Question.objects.create(
+            question_text="Live question",
+            pub_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(seconds=1))
+        self.choice = self.question.choice_set.create(choice_text="yes")
+
+    async def test_results_page_links_stream(self):
+        """The async results page points the browser at the stream."""
+        response = await self.async_client.get(
+            reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, reverse('polls:results_stream',
+                                              args=(self.question.id,)))
+
+    async def test_stream_until_end_date(self):
+        """Each change is pushed once and the stream ends with the poll."""
+        response = await self.async_client.get(
+            reverse('polls:results_stream', args=(self.question.id,)))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = []
+        async for chunk in response.streaming_content:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith('event:'):
+                name, data = chunk.split('\n')[:2]
+                events.append((name[7:], json.loads(data[6:])['total']))
+                if len(events) == 1:
+                    await Choice.objects.filter(pk=self.choice.pk).aupdate(
+                        vote_count=F('vote_count') + 1)
+        self.assertEqual(events, [('tally', 0), ('tally', 1), ('closed', 1)])
+
+    def test_not_routed_under_wsgi(self):
+        """The sync results page does not offer a stream."""
+        with self.settings(ROOT_URLCONF='kupolls.urls'):
+            response = self.client.get(
+                reverse('polls:results', args=(self.question.id,)))
+        self.assertIsNone(response.context['stream_url'])
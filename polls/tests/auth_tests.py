@@ -1,9 +1,19 @@
 """Tests for authentication system."""
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.urls import reverse
 
+from ..auth import check_shared_cache, user_key
+from .question_tests import create_question
+
+# What a deployment with a shared CACHE_BACKEND runs with; tests counting
+# queries use it so the session and user come from the cache.
+shared_cache = override_settings(
+    AUTH_USER_CACHE_TIMEOUT=300,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+
 
 class UserAuthTest(TestCase):
     """Contain tests for the authentication system."""
@@ -31,4 +41,58 @@ class UserAuthTest(TestCase):
         response = self.client.post(login_url, form_data)
         self.assertEqual(302, response.status_code)
         # should redirect us to the polls index page ("polls:index")
-        self.assertRedirects(response, reverse("polls:index"))
\ No newline at end of file
+        self.assertRedirects(response, reverse("polls:index"))
+
+
+@shared_cache
+class CachedAuthTests(TestCase):
+    """Logged-in requests load the session and user from a shared cache."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="cached",
+                                             password="Fat-Chance!")
+        self.client.force_login(self.user)
+        question = create_question(question_text="Cached", days=-1)
+        self.url = reverse('polls:detail', args=(question.id,))
+
+    def test_no_session_or_user_query(self):
+        """Once warm, the detail page only queries the poll data.
+
+        That is the question, its choices and the user's vote.
+        """
+        self.client.get(self.url)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_password_change_logs_out(self):
+        """Saving a new password drops the cached user at once."""
+        self.client.get(self.url)
+        self.user.set_password("Another-Chance!")
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f"{reverse('login')}?next={self.url}")
+
+    def test_logout_forgets_user(self):
+        """Logging out removes the user from the cache."""
+        self.client.get(self.url)
+        self.assertIsNotNone(cache.get(user_key(self.user.pk)))
+        self.client.post(reverse('logout'))
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_off_without_timeout(self):
+        """With no timeout the user is not cached."""
+        self.client.get(self.url)
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+
+    def test_per_process_cache_warning(self):
+        """Caching users or sessions in LocMemCache is flagged."""
+        self.assertEqual([warning.id for warning in check_shared_cache(None)],
+                         ['polls.W001', 'polls.W002'])
+        with self.settings(AUTH_USER_CACHE_TIMEOUT=0,
+                           SESSION_ENGINE='django.contrib.sessions'
+                                          '.backends.db'):
+            self.assertEqual(check_shared_cache(None), [])
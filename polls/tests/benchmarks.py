@@ -0,0 +1,140 @@
+"""Query-count and latency benchmarks for the polls views.
+
+Not part of the normal test run. Run them with
+
+    python manage.py test polls.tests.benchmarks
+
+Each view is requested on polls of several sizes. The query count must not
+exceed the one in benchmark_baseline.json, and the p95 latency must stay
+within BENCHMARK_TOLERANCE times the baseline, plus BENCHMARK_SLACK_MS.
+Set BENCHMARK_UPDATE=1 to write the measured values as the new baseline,
+and BENCHMARK_VOTES to a comma separated list to try other sizes.
+"""
+
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Choice, Vote
+from .auth_tests import shared_cache
+from .question_tests import create_question
+
+BASELINE = Path(__file__).with_name('benchmark_baseline.json')
+VOTES = [int(size) for size in
+         os.environ.get('BENCHMARK_VOTES', '10,1000,100000').split(',')]
+CHOICES = [2, 20]
+ROUNDS = int(os.environ.get('BENCHMARK_ROUNDS', 30))
+TOLERANCE = float(os.environ.get('BENCHMARK_TOLERANCE', 3.0))
+SLACK_MS = float(os.environ.get('BENCHMARK_SLACK_MS', 5.0))
+
+
+def percentile(timings, percent):
+    """Return the given percentile of a list of timings."""
+    return statistics.quantiles(timings, n=100, method='inclusive')[percent - 1]
+
+
+@tag('benchmark')
+@shared_cache
+@override_settings(VOTE_DEDUP_SECONDS=0, VOTE_RATE=0)
+class ViewBenchmarks(TestCase):
+    """Measure the index, detail, vote and results views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create max(VOTES) voters and one question per size."""
+        User.objects.bulk_create(
+            [User(username=f'bench{number}', password='!')
+             for number in range(max(VOTES))], batch_size=5000)
+        user_ids = list(User.objects.order_by('pk')
+                        .values_list('pk', flat=True))
+        cls.voter = User.objects.get(pk=user_ids[0])
+        cls.polls = {}
+        for votes in VOTES:
+            for choices in CHOICES:
+                question = create_question(
+                    question_text=f'{votes} votes, {choices} choices',
+                    days=-1)
+                choice_ids = [question.choice_set.create(
+                    choice_text=f'choice {number}').pk
+                    for number in range(choices)]
+                Vote.objects.bulk_create(
+                    [Vote(user_id=user_id, question=question,
+                          choice_id=choice_ids[number % choices])
+                     for number, user_id in enumerate(user_ids[:votes])],
+                    batch_size=5000)
+                cls.polls[f'{votes}v/{choices}c'] = (question, choice_ids)
+        Choice.objects.recount_votes()
+
+    def requests(self, question, choice_ids):
+        """Return the (name, request) pairs to measure on a question."""
+        index_url = reverse('polls:index')
+        detail_url = reverse('polls:detail', args=(question.id,))
+        vote_url = reverse('polls:vote', args=(question.id,))
+        results_url = reverse('polls:results', args=(question.id,))
+        flip = iter(range(10 ** 9))
+
+        def index():
+            cache.clear()
+            return self.client.get(index_url)
+
+        def vote():
+            choice = choice_ids[next(flip) % 2]
+            return self.client.post(vote_url, {'choice': choice})
+
+        return [('index', index),
+                ('detail', lambda: self.client.get(detail_url)),
+                ('vote', vote),
+                ('results', lambda: self.client.get(results_url))]
+
+    def measure(self, request):
+        """Return the query count and timings in ms of ROUNDS requests."""
+        request()
+        timings = []
+        queries = 0
+        for _ in range(ROUNDS):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = request()
+                timings.append((time.perf_counter() - start) * 1000)
+            self.assertLess(response.status_code, 400)
+            queries = max(queries, len(captured))
+        return {'queries': queries,
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'p99_ms': round(percentile(timings, 99), 2)}
+
+    def test_views(self):
+        """Compare every view and size against the committed baseline."""
+        self.client.force_login(self.voter)
+        measured = {}
+        for size, (question, choice_ids) in self.polls.items():
+            for name, request in self.requests(question, choice_ids):
+                measured[f'{name}/{size}'] = self.measure(request)
+        print()
+        for key, result in measured.items():
+            print(f'{key:<20} {result["queries"]:>3} queries  '
+                  f'p50 {result["p50_ms"]:>8.2f} ms  '
+                  f'p95 {result["p95_ms"]:>8.2f} ms  '
+                  f'p99 {result["p99_ms"]:>8.2f} ms')
+        if os.environ.get('BENCHMARK_UPDATE'):
+            BASELINE.write_text(json.dumps(measured, indent=2) + '\n')
+            return
+        baseline = json.loads(BASELINE.read_text())
+        for key, result in measured.items():
+            if key not in baseline:
+                continue
+            with self.subTest(key):
+                self.assertLessEqual(result['queries'],
+                                     baseline[key]['queries'])
+                self.assertLessEqual(
+                    result['p95_ms'],
+                    baseline[key]['p95_ms'] * TOLERANCE + SLACK_MS)
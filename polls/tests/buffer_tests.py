@@ -0,0 +1,109 @@
+"""Tests for the write-behind vote buffer."""
+
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from ..buffer import VoteBuffer, get_vote_buffer
+from ..models import Vote
+from .question_tests import create_question
+
+
+@override_settings(VOTE_BUFFER_ENABLED=True, VOTE_BUFFER_SIZE=100,
+                   VOTE_BUFFER_INTERVAL=0)
+class VoteBufferTests(TestCase):
+    """Votes are queued by vote() and written on flush."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="Fat-Chance!")
+        self.client.force_login(self.user)
+        self.question = create_question(question_text="Busy question",
+                                        days=-1)
+        self.first = self.question.choice_set.create(choice_text="first")
+        self.second = self.question.choice_set.create(choice_text="second")
+
+    def vote_for(self, choice):
+        """Post a vote for the given choice."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        return self.client.post(url, {'choice': choice.id})
+
+    def test_vote_is_queued(self):
+        """A buffered vote is not written until the buffer flushes."""
+        self.vote_for(self.first)
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(get_vote_buffer().flush(), 1)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.votes, 1)
+        self.assertEqual(Vote.objects.get().choice, self.first)
+
+    def test_results_show_own_queued_vote(self):
+        """The voter sees their queued vote on the results page."""
+        Vote.objects.cast(self.user, self.first)
+        self.vote_for(self.second)
+        response = self.client.get(reverse('polls:results',
+                                           args=(self.question.id,)))
+        votes = {choice.choice_text: choice.votes
+                 for choice in response.context['choices']}
+        self.assertEqual(votes, {'first': 0, 'second': 1})
+        self.assertEqual(response.context['total_votes'], 1)
+
+    def test_flush_on_size(self):
+        """The buffer flushes by itself once it is full."""
+        buffer = VoteBuffer(size=2, interval=0)
+        other = User.objects.create_user(username="other", password="x")
+        buffer.add(self.user.pk, self.question.pk, self.first.pk)
+        self.assertFalse(Vote.objects.exists())
+        buffer.add(other.pk, self.question.pk, self.second.pk)
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertEqual(len(buffer), 0)
+
+    def test_journal_is_replayed(self):
+        """Votes left in an orphaned journal are queued again."""
+        with tempfile.TemporaryDirectory() as journal_dir:
+            with open(f'{journal_dir}/votes-0.jsonl', 'w') as journal:
+                journal.write(f'[{self.user.pk}, {self.question.pk}, '
+                              f'{self.second.pk}]\n')
+            buffer = VoteBuffer(size=100, interval=0, journal_dir=journal_dir)
+            self.assertEqual(buffer.pending_choice(self.user.pk,
+                                                   self.question.pk),
+                             self.second.pk)
+            buffer.flush()
+        self.assertEqual(Vote.objects.get().choice, self.second)
+
+    def test_own_journal_is_replayed(self):
+        """A journal left by a crashed process with the same pid is kept."""
+        with tempfile.TemporaryDirectory() as journal_dir:
+            with open(f'{journal_dir}/votes-{os.getpid()}.jsonl',
+                      'w') as journal:
+                journal.write(f'[{self.user.pk}, {self.question.pk}, '
+                              f'{self.first.pk}]\n')
+            buffer = VoteBuffer(size=100, interval=0, journal_dir=journal_dir)
+            self.assertEqual(len(buffer), 1)
+            buffer.flush()
+        self.assertEqual(Vote.objects.get().choice, self.first)
+
+
+class VoteBufferFlushTests(TransactionTestCase):
+    """Flushes that hit foreign key errors, which are checked on commit."""
+
+    def test_invalid_vote_is_dropped(self):
+        """A vote for a deleted choice does not block the others."""
+        user = User.objects.create_user(username="voter", password="x")
+        other = User.objects.create_user(username="other", password="x")
+        question = create_question(question_text="Busy question", days=-1)
+        choice = question.choice_set.create(choice_text="first")
+        buffer = VoteBuffer(size=100, interval=0)
+        buffer.add(user.pk, question.pk, choice.pk)
+        buffer.add(other.pk, question.pk, 999)
+        with self.assertLogs('polls.buffer', 'WARNING'):
+            buffer.flush()
+        self.assertEqual(Vote.objects.get().user, user)
+        choice.refresh_from_db()
+        self.assertEqual(choice.votes, 1)
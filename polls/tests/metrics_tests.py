@@ -0,0 +1,64 @@
+"""Tests for the request metrics middleware and endpoint."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import Histogram, registry
+from .question_tests import create_question
+
+
+class MetricsTests(TestCase):
+    """Requests are measured per URL name and exposed for Prometheus."""
+
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        cache.clear()
+        self.staff = User.objects.create_user(username="staff", password="x",
+                                              is_staff=True)
+
+    def metric_line(self, text, prefix):
+        """Return the value of the line starting with prefix."""
+        for line in text.splitlines():
+            if line.startswith(prefix):
+                return float(line.rsplit(' ', 1)[1])
+        self.fail(f'No line starting with {prefix}')
+
+    def test_records_per_view(self):
+        """Index requests are counted with their queries and templates."""
+        create_question(question_text="Measured", days=-1)
+        self.client.get(reverse('polls:index'))
+        self.client.get(reverse('polls:index'))
+        self.client.force_login(self.staff)
+        text = self.client.get(reverse('polls:metrics')).content.decode()
+        self.assertEqual(self.metric_line(
+            text, 'polls_request_seconds_count{view="polls:index"}'), 2)
+        # Only the first request misses the cache: 2 queries.
+        self.assertEqual(self.metric_line(
+            text, 'polls_db_queries_sum{view="polls:index"}'), 2)
+        self.assertGreater(self.metric_line(
+            text, 'polls_template_seconds_sum{view="polls:index"}'), 0)
+
+    def test_requires_staff(self):
+        """Other users are refused."""
+        response = self.client.get(reverse('polls:metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_bearer_token(self):
+        """A configured token lets a scraper in without a session."""
+        url = reverse('polls:metrics')
+        self.assertEqual(self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertContains(response, '# TYPE polls_request_seconds histogram')
+
+    def test_histogram_buckets(self):
+        """Values land in the first bucket whose bound is not below them."""
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 9):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual((histogram.sum, histogram.count), (13, 4))
@@ -0,0 +1,79 @@
+"""Tests for sampled request profiling."""
+
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..profiling import list_profiles, profile_view, rotate
+from .question_tests import create_question
+
+
+class ProfilingTests(TestCase):
+    """Sampled or requested profiles are saved, tagged and capped."""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        override = override_settings(PROFILE_DIR=self.directory,
+                                     PROFILE_SAMPLE_RATE=0.0)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.question = create_question(question_text="Profiled", days=-1)
+
+    def test_not_profiled_by_default(self):
+        """With no sampling and no header nothing is written."""
+        self.client.get(reverse('polls:index'))
+        self.assertEqual(list_profiles(self.directory), [])
+
+    def test_sampled_profile_is_tagged(self):
+        """A sampled request is saved under its view and query count."""
+        with self.settings(PROFILE_SAMPLE_RATE=1.0):
+            self.client.get(reverse('polls:results',
+                                    args=(self.question.id,)))
+        paths = list_profiles(self.directory)
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(profile_view(paths[0]), 'polls.results')
+        self.assertRegex(os.path.basename(paths[0]), r'^\d+-[1-9]\d*q-')
+        self.assertEqual(list_profiles(self.directory, 'polls:results'),
+                         paths)
+
+    def test_header_requires_staff(self):
+        """The header only forces a profile for staff users."""
+        user = User.objects.create_user(username="user", password="x")
+        self.client.force_login(user)
+        self.client.get(reverse('polls:index'), HTTP_X_PROFILE='1')
+        self.assertEqual(list_profiles(self.directory), [])
+        user.is_staff = True
+        user.save()
+        self.client.get(reverse('polls:index'), HTTP_X_PROFILE='1')
+        self.assertEqual(len(list_profiles(self.directory)), 1)
+
+    def test_rotate_drops_oldest(self):
+        """The directory is trimmed to the size cap, oldest first."""
+        for name in ['1-0q-a.prof', '2-0q-b.prof', '3-0q-c.prof']:
+            with open(os.path.join(self.directory, name), 'w') as file:
+                file.write('x' * 10)
+        rotate(self.directory, 25)
+        self.assertEqual([profile_view(path) for path in
+                          list_profiles(self.directory)], ['b', 'c'])
+
+    def test_summary_command(self):
+        """profile_summary prints the merged statistics."""
+        with self.assertRaises(CommandError):
+            call_command('profile_summary', dir=self.directory)
+        with self.settings(PROFILE_SAMPLE_RATE=1.0):
+            self.client.get(reverse('polls:index'))
+            self.client.get(reverse('polls:index'))
+        out = StringIO()
+        call_command('profile_summary', view='polls:index', limit=5,
+                     stdout=out)
+        self.assertIn('2 profiles', out.getvalue())
+        self.assertIn('function calls', out.getvalue())
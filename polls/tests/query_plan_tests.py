@@ -0,0 +1,80 @@
+"""Tests that the hot queries are served by indexes."""
+
+import re
+import unittest
+
+from django.db import connection
+from django.db.models import Count, Min
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Choice, Question, Vote
+
+FULL_SCAN = re.compile(r'\bSCAN (polls_\w+|auth_user)\b')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Checks SQLite plans.')
+class QueryPlanTests(TestCase):
+    """EXPLAIN each hot query and fail on a full table scan."""
+
+    def assertNoFullScan(self, queryset):
+        """Fail if the plan of queryset scans a whole table or index."""
+        plan = queryset.explain()
+        scans = FULL_SCAN.findall(plan)
+        self.assertFalse(scans, f'Full scan of {scans} in:\n{plan}')
+
+    def test_index_list(self):
+        """IndexView: published questions, newest first."""
+        self.assertNoFullScan(
+            Question.objects.filter(pub_date__lte=timezone.now())
+            .order_by('-pub_date')[:5])
+
+    def test_archive_page(self):
+        """ArchiveView: a keyset page after a cursor."""
+        now = timezone.now()
+        self.assertNoFullScan(
+            Question.objects.open(now).before(now, 10)
+            .order_by('-pub_date', '-pk')[:21])
+
+    def test_next_publication(self):
+        """Index cache: the next pub_date still to come."""
+        self.assertNoFullScan(
+            Question.objects.filter(pub_date__gt=timezone.now())
+            .values('pub_date').annotate(next=Min('pub_date'))
+            .order_by('pub_date')[:1])
+
+    def test_vote_for_user(self):
+        """get_vote_for_user and Vote.objects.cast."""
+        self.assertNoFullScan(Vote.objects.filter(user_id=1, question_id=1))
+
+    def test_votes_for_user(self):
+        """get_votes_for_user: a user's votes on a page of questions."""
+        self.assertNoFullScan(
+            Vote.objects.filter(user_id=1, question_id__in=[1, 2, 3])
+            .values_list('question_id', 'choice_id'))
+
+    def test_votes_of_user(self):
+        """Cascading a deleted user to their votes."""
+        self.assertNoFullScan(Vote.objects.filter(user_id=1))
+
+    def test_question_tally(self):
+        """Votes of a question grouped by choice."""
+        self.assertNoFullScan(
+            Vote.objects.filter(question_id=1).values('choice')
+            .annotate(total=Count('pk')).order_by())
+
+    def test_choice_recount(self):
+        """ChoiceQuerySet.recount_votes: votes of one choice."""
+        self.assertNoFullScan(
+            Vote.objects.filter(choice_id=1).values('choice')
+            .annotate(total=Count('pk')).order_by())
+
+    def test_results(self):
+        """ResultsView: choices of a question with the vote total."""
+        self.assertNoFullScan(Choice.objects.filter(question_id=1)
+                              .with_results())
+
+    def test_detects_full_scan(self):
+        """The check itself fails on an unindexed filter."""
+        with self.assertRaises(AssertionError):
+            self.assertNoFullScan(Question.objects.filter(question_text='x'))
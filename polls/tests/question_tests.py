@@ -2,10 +2,12 @@
 
 import datetime
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 from django.urls import reverse
 
+from ..cache import index_timeout
 from ..models import Question
 
 
@@ -42,6 +44,32 @@ class QuestionModelTests(TestCase):
 
         self.assertIs(question.can_vote(), False)
 
+    def test_can_vote_without_end_date(self):
+        """A question with no end date stays open."""
+        question = Question(pub_date=timezone.now() - datetime.timedelta(days=1))
+
+        self.assertIs(question.can_vote(), True)
+
+    def test_with_status_matches_get_status(self):
+        """The SQL status agrees with the Python one at the same moment."""
+        now = timezone.now()
+        day = datetime.timedelta(days=1)
+        expected = {
+            "upcoming": Question.objects.create(pub_date=now + day),
+            "open": Question.objects.create(pub_date=now - day),
+            "open until": Question.objects.create(pub_date=now - day,
+                                                  end_date=now + day),
+            "closed": Question.objects.create(pub_date=now - 2 * day,
+                                              end_date=now - day),
+        }
+        statuses = dict(Question.objects.with_status(now)
+                        .values_list('pk', 'status'))
+        for name, question in expected.items():
+            with self.subTest(name):
+                self.assertEqual(statuses[question.pk],
+                                 question.get_status(now))
+                self.assertEqual(statuses[question.pk], name.split()[0])
+
     def test_was_published_recently_with_future_question(self):
         """Test for published recently with future question."""
         time = timezone.now() + datetime.timedelta(days=30)
@@ -85,6 +113,10 @@ def create_question(question_text, days):
 class QuestionIndexViewTests(TestCase):
     """Class for QuestionIndexViewTests."""
 
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
         response = self.client.get(reverse('polls:index'))
@@ -127,6 +159,51 @@ class QuestionIndexViewTests(TestCase):
                                   '<Question: Past question 1.>'])
 
 
+class QuestionIndexCacheTests(TestCase):
+    """The index question list is cached until it can change."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_index_is_cached(self):
+        """A second visit does not query the questions again."""
+        create_question(question_text="Past question.", days=-5)
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Past question.")
+
+    def test_saving_a_question_invalidates(self):
+        """An edited question shows up on the next visit."""
+        question = create_question(question_text="Old text", days=-5)
+        self.client.get(reverse('polls:index'))
+        question.question_text = "New text"
+        question.save()
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "New text")
+
+    def test_deleting_a_question_invalidates(self):
+        """A deleted question disappears on the next visit."""
+        question = create_question(question_text="Gone soon", days=-5)
+        self.client.get(reverse('polls:index'))
+        question.delete()
+        response = self.client.get(reverse('polls:index'))
+        self.assertNotContains(response, "Gone soon")
+
+    def test_expires_at_next_boundary(self):
+        """The cache lives until the next pub_date or end_date."""
+        now = timezone.now()
+        open_question = Question(pub_date=now - datetime.timedelta(days=1),
+                                 end_date=now + datetime.timedelta(hours=2))
+        next_pub_date = now + datetime.timedelta(hours=1)
+        self.assertEqual(index_timeout([open_question], next_pub_date, now),
+                         3600)
+        self.assertEqual(index_timeout([open_question], None, now), 3600)
+        soon = now + datetime.timedelta(minutes=5)
+        self.assertEqual(index_timeout([], soon, now), 300)
+
+
 class QuestionDetailViewTests(TestCase):
     """Class for QuestionDetailViewTests."""
 
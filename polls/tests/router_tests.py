@@ -0,0 +1,115 @@
+"""Tests for the primary/replica database router."""
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..middleware import STICKY_COOKIE
+from ..models import Question
+from ..routers import PrimaryReplicaRouter
+from .question_tests import create_question
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingTests(TestCase):
+    """Read views go to a replica until the client writes.
+
+    The default database stands in for the replica; random.choice is
+    watched to see whether a replica was picked.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="Fat-Chance!")
+        self.question = create_question(question_text="Routed", days=-1)
+        self.choice = self.question.choice_set.create(choice_text="yes")
+        patcher = mock.patch('polls.routers.random.choice',
+                             side_effect=lambda aliases: aliases[0])
+        self.pick = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_read_views_use_replica(self):
+        """Index, results and JSON results read from a replica."""
+        for url in [reverse('polls:index'),
+                    reverse('polls:results', args=(self.question.id,)),
+                    reverse('polls:results_json', args=(self.question.id,))]:
+            self.pick.reset_mock()
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertTrue(self.pick.called, url)
+
+    def test_other_views_use_primary(self):
+        """Views not marked for replica reads stay on the primary."""
+        self.client.force_login(self.user)
+        self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertFalse(self.pick.called)
+
+    def test_vote_sticks_to_primary(self):
+        """After voting, the client reads its results from the primary."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            {'choice': self.choice.id})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertFalse(self.pick.called)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_cookie_without_replicas(self):
+        """Without replicas there is nothing to stick to."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            {'choice': self.choice.id})
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=['test_replica'])
+class SeparateReplicaTests(TestCase):
+    """Reads reach a replica database that differs from the primary."""
+
+    databases = {'default', 'test_replica'}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        now = timezone.now()
+        Question.objects.create(question_text="Only on the primary",
+                                pub_date=now)
+        Question.objects.using('test_replica').create(
+            question_text="Only on the replica", pub_date=now)
+
+    def test_index_reads_replica(self):
+        """The index lists the rows of the replica."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Only on the replica")
+        self.assertNotContains(response, "Only on the primary")
+
+    def test_sticky_client_reads_primary(self):
+        """A client that just voted gets the index from the primary."""
+        self.client.cookies[STICKY_COOKIE] = '1'
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Only on the primary")
+        self.assertNotContains(response, "Only on the replica")
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class PrimaryReplicaRouterTests(TestCase):
+    """Routing outside of requests and for migrations."""
+
+    def test_outside_request(self):
+        """Commands and background threads use the primary."""
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Question), 'default')
+        self.assertEqual(router.db_for_write(Question), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        """Only the primary is migrated."""
+        router = PrimaryReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica1', 'polls'))
+        self.assertIsNone(router.allow_migrate('default', 'polls'))
@@ -0,0 +1,118 @@
+"""Tests for frozen results of closed questions."""
+
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Choice, Question, ResultSnapshot, Vote
+from ..routers import RequestRouting, current_request
+from ..snapshots import freeze
+
+
+class ResultSnapshotTests(TestCase):
+    """Closed questions are shown from a snapshot taken once."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        now = timezone.now()
+        self.closed = Question.objects.create(
+            question_text="Closed poll",
+            pub_date=now - datetime.timedelta(days=2),
+            end_date=now - datetime.timedelta(days=1))
+        self.open = Question.objects.create(
+            question_text="Open poll",
+            pub_date=now - datetime.timedelta(days=1))
+        self.yes = self.closed.choice_set.create(choice_text="yes",
+                                                 vote_count=3)
+        self.closed.choice_set.create(choice_text="no", vote_count=1)
+        self.open.choice_set.create(choice_text="maybe", vote_count=2)
+        self.url = reverse('polls:results', args=(self.closed.id,))
+
+    def test_closed_results_are_frozen(self):
+        """Later counter changes do not show once the snapshot exists."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_votes'], 4)
+        self.assertContains(response, "75.0%")
+        self.assertNotContains(response, "Vote again?")
+        Choice.objects.filter(pk=self.yes.pk).update(vote_count=10)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, "75.0%")
+        self.assertEqual(ResultSnapshot.objects.count(), 1)
+
+    def test_grace_period(self):
+        """A question that just closed is shown live for a while."""
+        now = timezone.now()
+        Question.objects.filter(pk=self.closed.pk).update(
+            end_date=now - datetime.timedelta(seconds=10))
+        with self.settings(SNAPSHOT_GRACE_SECONDS=60):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['total_votes'], 4)
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_frozen_from_primary(self):
+        """The final counts are read from the primary, not a replica."""
+        routing = RequestRouting()
+        routing.use_replica = True
+        token = current_request.set(routing)
+        self.addCleanup(current_request.reset, token)
+        with mock.patch('polls.routers.random.choice') as pick:
+            pick.side_effect = lambda aliases: aliases[0]
+            freeze(self.closed)
+        self.assertEqual(ResultSnapshot.objects.get().total, 4)
+        self.assertFalse(pick.called)
+
+    def test_open_results_are_live(self):
+        """Open questions get no snapshot."""
+        response = self.client.get(
+            reverse('polls:results', args=(self.open.id,)))
+        self.assertContains(response, "Vote again?")
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+    def test_moved_end_date_makes_snapshot_stale(self):
+        """Reopening a question shows live counts again."""
+        self.client.get(self.url)
+        Choice.objects.filter(pk=self.yes.pk).update(vote_count=5)
+        self.closed.end_date = timezone.now() + datetime.timedelta(days=1)
+        self.closed.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_votes'], 6)
+
+    def test_json_from_snapshot(self):
+        """The JSON results of a closed question come from the snapshot."""
+        url = reverse('polls:results_json', args=(self.closed.id,))
+        self.client.get(url)
+        Choice.objects.filter(pk=self.yes.pk).update(vote_count=10)
+        data = self.client.get(url).json()
+        self.assertTrue(data['closed'])
+        self.assertEqual(data['total'], 4)
+
+    def test_vote_on_closed_question_refused(self):
+        """A closed question's tally cannot change through vote()."""
+        user = User.objects.create_user(username="late", password="x")
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('polls:vote', args=(self.closed.id,)),
+            {'choice': self.yes.id})
+        self.assertRedirects(response, reverse('polls:index'))
+        self.assertFalse(Vote.objects.exists())
+
+    def test_backfill_command(self):
+        """snapshot_results freezes closed questions once."""
+        out = StringIO()
+        call_command('snapshot_results', stdout=out)
+        self.assertIn('Froze 1 questions.', out.getvalue())
+        snapshot = ResultSnapshot.objects.get()
+        self.assertEqual(snapshot.question, self.closed)
+        self.assertEqual(snapshot.total, 4)
+        call_command('snapshot_results', stdout=out)
+        self.assertIn('Froze 0 questions.', out.getvalue())
@@ -0,0 +1,77 @@
+"""Tests for the hashed and precompressed static files."""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .question_tests import create_question
+
+
+class StaticFilesTests(TestCase):
+    """collectstatic output is served compressed and cached for long."""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(STATIC_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.root = root
+        call_command('collectstatic', interactive=False, verbosity=0,
+                     ignore_patterns=['admin'])
+        with open(os.path.join(root, 'staticfiles.json')) as f:
+            self.manifest = json.load(f)['paths']
+
+    def test_hashed_and_compressed_copies(self):
+        """Text files get a .gz copy, images do not."""
+        hashed = self.manifest['polls/results.css']
+        self.assertRegex(hashed, r'^polls/results\.[0-9a-f]{12}\.css$')
+        with gzip.open(os.path.join(self.root, hashed + '.gz')) as f:
+            self.assertIn(b'border-collapse', f.read())
+        gif = self.manifest['polls/images/background.gif']
+        self.assertFalse(os.path.exists(os.path.join(self.root, gif + '.gz')))
+
+    def test_templates_link_hashed_names(self):
+        """Pages link the hashed CSS instead of inlining styles."""
+        question = create_question(question_text="Styled", days=-1)
+        response = self.client.get(
+            reverse('polls:results', args=(question.id,)))
+        self.assertContains(
+            response, '/static/' + self.manifest['polls/results.css'])
+        self.assertNotContains(response, '<style>')
+
+    def test_hashed_file_is_immutable(self):
+        """A hashed name is sent gzipped and cached for a year."""
+        url = '/static/' + self.manifest['polls/results.css']
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn(b'border-collapse', body)
+
+    @override_settings(STATIC_MAX_AGE=60)
+    def test_plain_name_is_revalidated(self):
+        """Unhashed names are cached briefly and sent as is on request."""
+        response = self.client.get('/static/polls/results.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(
+            '/static/polls/results.css',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_and_outside_files_pass_through(self):
+        """Unknown names and paths leaving STATIC_ROOT are not served."""
+        self.assertEqual(self.client.get('/static/nope.css').status_code, 404)
+        response = self.client.get('/static/..%2Fsettings.py')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,83 @@
+"""Tests for vote deduplication and rate limiting."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Vote
+from .auth_tests import shared_cache
+from .question_tests import create_question
+
+
+@shared_cache
+class VoteThrottleTests(TestCase):
+    """Repeated and too frequent votes are answered from the cache."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="Fat-Chance!")
+        self.client.force_login(self.user)
+        self.question = create_question(question_text="Busy question",
+                                        days=-1)
+        self.first = self.question.choice_set.create(choice_text="first")
+        self.second = self.question.choice_set.create(choice_text="second")
+        self.url = reverse('polls:vote', args=(self.question.id,))
+        self.results_url = reverse('polls:results', args=(self.question.id,))
+
+    def test_duplicate_vote_skips_database(self):
+        """A double-click redirects to the results without any query."""
+        self.client.post(self.url, {'choice': self.first.id})
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'choice': self.first.id})
+        self.assertRedirects(response, self.results_url)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_other_choice_is_not_a_duplicate(self):
+        """Changing the choice is a new vote."""
+        self.client.post(self.url, {'choice': self.first.id})
+        self.client.post(self.url, {'choice': self.second.id})
+        self.assertEqual(Vote.objects.get().choice, self.second)
+
+    def test_return_to_earlier_choice(self):
+        """Voting A, B, then A again within the window ends on A."""
+        for choice in (self.first, self.second, self.first):
+            self.client.post(self.url, {'choice': choice.id})
+        self.assertEqual(Vote.objects.get().choice, self.first)
+
+    @override_settings(VOTE_BURST=1, VOTE_RATE=0.01)
+    def test_rate_limited_vote_is_not_remembered(self):
+        """A vote refused with 429 goes through when retried."""
+        self.client.post(self.url, {'choice': self.first.id})
+        response = self.client.post(self.url, {'choice': self.second.id})
+        self.assertEqual(response.status_code, 429)
+        cache.delete(f'polls:vote-bucket:{self.user.pk}')
+        self.client.post(self.url, {'choice': self.second.id})
+        self.assertEqual(Vote.objects.get().choice, self.second)
+
+    @override_settings(VOTE_DEDUP_SECONDS=0, VOTE_BURST=0)
+    def test_zero_burst_disables_limit(self):
+        """VOTE_BURST=0 turns the rate limit off like VOTE_RATE=0."""
+        for choice in (self.first, self.second, self.first):
+            response = self.client.post(self.url, {'choice': choice.id})
+            self.assertRedirects(response, self.results_url)
+
+    @override_settings(VOTE_DEDUP_SECONDS=0, VOTE_BURST=2, VOTE_RATE=0.01)
+    def test_rate_limit(self):
+        """Votes beyond the burst get a 429 without any query."""
+        self.client.post(self.url, {'choice': self.first.id})
+        self.client.post(self.url, {'choice': self.second.id})
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'choice': self.first.id})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '100')
+        self.assertEqual(Vote.objects.get().choice, self.second)
+
+    @override_settings(VOTE_DEDUP_SECONDS=0, VOTE_RATE=0)
+    def test_checks_can_be_disabled(self):
+        """With both checks off every vote goes through."""
+        for _ in range(10):
+            response = self.client.post(self.url, {'choice': self.first.id})
+            self.assertRedirects(response, self.results_url)
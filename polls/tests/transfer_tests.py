@@ -0,0 +1,109 @@
+"""Tests for the export_polls and import_polls commands."""
+
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Choice, Question, Vote
+from .question_tests import create_question
+
+
+class TransferCommandTests(TestCase):
+    """A dump made by export_polls loads back with import_polls."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="voter", password="x")
+        self.question = create_question(question_text="Moved question",
+                                        days=-1)
+        self.choice = self.question.choice_set.create(choice_text="yes")
+        self.question.choice_set.create(choice_text="no")
+        Vote.objects.cast(self.user, self.choice)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def round_trip(self, name, **options):
+        """Export everything, wipe the polls and import the dump again."""
+        path = os.path.join(self.directory.name, name)
+        call_command('export_polls', path, stderr=StringIO(), **options)
+        Question.objects.all().delete()
+        out = StringIO()
+        call_command('import_polls', path, batch_size=1, stdout=out,
+                     stderr=StringIO())
+        return out.getvalue()
+
+    def assertRestored(self):
+        """Check the question, its choices, the vote and its counter."""
+        question = Question.objects.get(pk=self.question.pk)
+        self.assertEqual(question.question_text, "Moved question")
+        self.assertEqual(question.pub_date, self.question.pub_date)
+        self.assertEqual(question.end_date, self.question.end_date)
+        self.assertEqual(question.choice_set.count(), 2)
+        vote = Vote.objects.get()
+        self.assertEqual((vote.user, vote.choice), (self.user, self.choice))
+        self.assertEqual(Choice.objects.get(pk=self.choice.pk).votes, 1)
+
+    def test_jsonl_round_trip(self):
+        """JSON Lines keeps every field."""
+        output = self.round_trip('polls.jsonl')
+        self.assertIn('imported 4', output)
+        self.assertRestored()
+
+    def test_csv_round_trip(self):
+        """CSV keeps every field and is picked from the extension."""
+        self.round_trip('polls.csv', format='csv')
+        self.assertRestored()
+
+    def test_unknown_user_is_skipped(self):
+        """Votes of users missing here are counted as skipped."""
+        path = os.path.join(self.directory.name, 'polls.jsonl')
+        call_command('export_polls', path, stderr=StringIO())
+        Question.objects.all().delete()
+        self.user.delete()
+        out = StringIO()
+        call_command('import_polls', path, stdout=out, stderr=StringIO())
+        self.assertIn('skipped 1', out.getvalue())
+        self.assertFalse(Vote.objects.exists())
+
+    def test_import_over_recast_vote(self):
+        """A vote recast here since the dump, with a new id, is overwritten."""
+        path = os.path.join(self.directory.name, 'polls.jsonl')
+        call_command('export_polls', path, stderr=StringIO())
+        other = self.question.choice_set.get(choice_text="no")
+        Vote.objects.all().delete()
+        Vote.objects.cast(self.user, other)
+        call_command('import_polls', path, stdout=StringIO(),
+                     stderr=StringIO())
+        self.assertEqual(Vote.objects.get().choice, self.choice)
+        self.assertEqual(Choice.objects.get(pk=self.choice.pk).votes, 1)
+        self.assertEqual(Choice.objects.get(pk=other.pk).votes, 0)
+
+    def test_failed_batch_still_recounts(self):
+        """Counters of the rows written before a bad row are rebuilt."""
+        path = os.path.join(self.directory.name, 'polls.jsonl')
+        call_command('export_polls', path, stderr=StringIO())
+        with open(path, 'a', encoding='utf-8') as stream:
+            stream.write('{"model": "poll", "id": 1}\n')
+        Choice.objects.update(vote_count=99)
+        with self.assertRaises(ValueError):
+            call_command('import_polls', path, stdout=StringIO(),
+                         stderr=StringIO())
+        self.assertEqual(Choice.objects.get(pk=self.choice.pk).votes, 1)
+
+    def test_export_to_stdout(self):
+        """Without a file the rows go to standard output."""
+        out = StringIO()
+        call_command('export_polls', stdout=out, stderr=StringIO())
+        self.assertEqual(out.getvalue().count('\n'), 4)
+
+    def test_export_since(self):
+        """--since leaves out older questions."""
+        out = StringIO()
+        call_command('export_polls', since=self.question.pub_date.replace(
+            year=self.question.pub_date.year + 1), stdout=out,
+            stderr=StringIO())
+        self.assertEqual(out.getvalue(), '')
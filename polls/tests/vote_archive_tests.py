@@ -0,0 +1,142 @@
+"""Tests for moving votes of long closed questions to the archive."""
+
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import ArchivedVote, Choice, Question, Vote, VoteEvent
+from ..transfer import Importer, export_rows
+from ..views import get_vote_for_user, get_votes_for_user
+
+
+class VoteArchiveTests(TestCase):
+    """Votes of old closed questions leave the Vote table but still count."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        now = timezone.now()
+        self.old = Question.objects.create(
+            question_text="Old poll",
+            pub_date=now - datetime.timedelta(days=400),
+            end_date=now - datetime.timedelta(days=365))
+        self.recent = Question.objects.create(
+            question_text="Recently closed",
+            pub_date=now - datetime.timedelta(days=3),
+            end_date=now - datetime.timedelta(days=2))
+        self.yes = self.old.choice_set.create(choice_text="yes")
+        self.no = self.old.choice_set.create(choice_text="no")
+        self.other = self.recent.choice_set.create(choice_text="other")
+        self.users = [User.objects.create_user(username=f"voter{i}")
+                      for i in range(5)]
+        for i, user in enumerate(self.users):
+            Vote.objects.cast(user, self.yes if i < 3 else self.no)
+            Vote.objects.cast(user, self.other)
+        self.before = now - datetime.timedelta(days=180)
+
+    def test_archive_moves_old_votes_in_batches(self):
+        """Only questions closed before the cutoff are moved."""
+        events = VoteEvent.objects.count()
+        self.assertEqual(ArchivedVote.objects.archive(self.before, 2), (1, 5))
+        self.old.refresh_from_db()
+        self.assertTrue(self.old.votes_archived)
+        self.assertFalse(Vote.objects.filter(question=self.old).exists())
+        self.assertEqual(Vote.objects.count(), 5)
+        self.assertEqual(ArchivedVote.objects.tallies([self.old.pk]),
+                         {self.yes.pk: 3, self.no.pk: 2})
+        self.assertEqual(VoteEvent.objects.count(), events)
+        self.assertEqual(ArchivedVote.objects.archive(self.before), (0, 0))
+
+    def test_interrupted_run_is_resumed(self):
+        """Votes left behind under a marked question are moved next time."""
+        Question.objects.filter(pk=self.old.pk).update(votes_archived=True)
+        self.old.refresh_from_db()
+        user = self.users[0]
+        self.assertEqual(get_vote_for_user(user, self.old).choice_id,
+                         self.yes.pk)
+        self.assertEqual(ArchivedVote.objects.archive(self.before), (1, 5))
+        self.assertEqual(get_vote_for_user(user, self.old).choice_id,
+                         self.yes.pk)
+
+    def test_vote_refused(self):
+        """A reopened question cannot take votes until it is restored."""
+        ArchivedVote.objects.archive(self.before)
+        Question.objects.filter(pk=self.old.pk).update(end_date=None)
+        user = User.objects.create_user(username="late", password="x")
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('polls:vote', args=(self.old.id,)),
+            {'choice': self.yes.id})
+        self.assertRedirects(response, reverse('polls:index'))
+        self.assertFalse(Vote.objects.filter(user=user).exists())
+
+    def test_counts_survive_recount(self):
+        """Recounting and the vote log include archived votes."""
+        ArchivedVote.objects.archive(self.before)
+        Choice.objects.update(vote_count=0)
+        Choice.objects.recount_votes()
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.vote_count, 3)
+        Choice.objects.update(vote_count=0)
+        Choice.objects.replay_votes()
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.vote_count, 3)
+
+    def test_results_page(self):
+        """Results of an archived question are still shown."""
+        ArchivedVote.objects.archive(self.before)
+        response = self.client.get(reverse('polls:results',
+                                           args=(self.old.id,)))
+        self.assertEqual(response.context['total_votes'], 5)
+
+    def test_user_lookups(self):
+        """A user's archived vote is still found."""
+        ArchivedVote.objects.archive(self.before)
+        self.old.refresh_from_db()
+        user = self.users[4]
+        self.assertEqual(get_vote_for_user(user, self.old).choice_id,
+                         self.no.pk)
+        self.assertEqual(get_votes_for_user(user, [self.old, self.recent]),
+                         {self.old.pk: self.no.pk,
+                          self.recent.pk: self.other.pk})
+
+    def test_restore(self):
+        """Restored votes go back to the Vote table with their ids."""
+        ids = set(Vote.objects.filter(question=self.old)
+                  .values_list('pk', flat=True))
+        ArchivedVote.objects.archive(self.before)
+        self.assertEqual(ArchivedVote.objects.restore([self.old.pk]), 5)
+        self.assertEqual(set(Vote.objects.filter(question=self.old)
+                             .values_list('pk', flat=True)), ids)
+        self.assertFalse(ArchivedVote.objects.exists())
+        self.old.refresh_from_db()
+        self.assertFalse(self.old.votes_archived)
+
+    def test_export_and_reimport(self):
+        """Dumps include archived votes; reimporting does not count twice."""
+        ArchivedVote.objects.archive(self.before)
+        rows = list(export_rows(Question.objects.all()))
+        self.assertEqual(sum(row['model'] == 'vote' for row in rows), 10)
+        importer = Importer()
+        for row in rows:
+            importer.add(row)
+        importer.finish()
+        self.assertEqual(Vote.objects.count(), 10)
+        self.assertFalse(ArchivedVote.objects.exists())
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.vote_count, 3)
+
+    def test_command(self):
+        """archive_votes archives by age and restores by question id."""
+        out = StringIO()
+        call_command('archive_votes', '--older-than', '180', stdout=out)
+        self.assertIn('Archived 5 votes of 1 questions.', out.getvalue())
+        call_command('archive_votes', '--restore', str(self.old.pk),
+                     stdout=out)
+        self.assertIn('Restored 5 votes.', out.getvalue())
@@ -0,0 +1,417 @@
+"""Tests for voting and vote counters."""
+
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import (Choice, ChoiceShard, Question, TallyCheckpoint, Vote,
+                      VoteEvent)
+from ..buffer import get_vote_buffer
+from ..views import get_vote_for_user, get_votes_for_user
+from .auth_tests import shared_cache
+from .question_tests import create_question
+
+
+class VoteCounterTests(TestCase):
+    """Check that Choice.vote_count follows the votes."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="Fat-Chance!")
+        self.client.force_login(self.user)
+        self.question = create_question(question_text="Open question",
+                                        days=-1)
+        self.first = self.question.choice_set.create(choice_text="first")
+        self.second = self.question.choice_set.create(choice_text="second")
+
+    def vote_for(self, choice):
+        """Post a vote for the given choice."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        return self.client.post(url, {'choice': choice.id})
+
+    def test_new_vote_increments_counter(self):
+        """A first vote adds one to the chosen choice."""
+        response = self.vote_for(self.first)
+        self.assertRedirects(response,
+                             reverse('polls:results', args=(self.question.id,)))
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.votes, 1)
+
+    def test_changed_vote_moves_counter(self):
+        """Changing a vote moves the count to the new choice."""
+        self.vote_for(self.first)
+        self.vote_for(self.second)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.votes, 0)
+        self.assertEqual(self.second.votes, 1)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_same_vote_twice_counts_once(self):
+        """Voting for the same choice again does not change the count."""
+        self.vote_for(self.first)
+        self.vote_for(self.first)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.votes, 1)
+
+    def test_vote_stores_question(self):
+        """A vote records the question of its choice."""
+        self.vote_for(self.first)
+        self.assertEqual(get_vote_for_user(self.user, self.question).choice,
+                         self.first)
+
+    def test_one_vote_per_user_and_question(self):
+        """The database rejects a second vote row for the same question."""
+        Vote.objects.create(user=self.user, choice=self.first)
+        with self.assertRaises(IntegrityError):
+            Vote.objects.create(user=self.user, choice=self.second)
+
+    def test_cast_query_count(self):
+        """Changing a vote is a voter lock, a read, an upsert, a log insert
+        and 3 updates.
+
+        The updates are the counters of the two choices and the tally
+        version.
+        """
+        Vote.objects.cast(self.user, self.first)
+        # SAVEPOINT and RELEASE come from the atomic block in tests.
+        with self.assertNumQueries(9) as queries:
+            previous = Vote.objects.cast(self.user, self.second)
+        self.assertEqual(previous, self.first.pk)
+        self.assertIn('auth_user', queries.captured_queries[1]['sql'])
+
+    def test_recount_votes_command(self):
+        """recount_votes rebuilds counters from the Vote table."""
+        Vote.objects.create(user=self.user, choice=self.second)
+        Choice.objects.update(vote_count=7)
+        call_command('recount_votes', stdout=StringIO())
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.votes, 0)
+        self.assertEqual(self.second.votes, 1)
+
+
+class ResultsViewTests(TestCase):
+    """Check the results page and its query count."""
+
+    def setUp(self):
+        super().setUp()
+        self.question = create_question(question_text="Results question",
+                                        days=-1)
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def add_choices(self, count):
+        """Create count choices with 1, 2, ... votes."""
+        for number in range(1, count + 1):
+            self.question.choice_set.create(choice_text=f"choice {number}",
+                                            vote_count=number)
+
+    def test_totals_and_percentages(self):
+        """The page shows each choice's share of the total."""
+        self.question.choice_set.create(choice_text="yes", vote_count=3)
+        self.question.choice_set.create(choice_text="no", vote_count=1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_votes'], 4)
+        percents = [choice.percent for choice in response.context['choices']]
+        self.assertEqual(percents, [75.0, 25.0])
+
+    def test_question_without_choices(self):
+        """A question with no choices still renders."""
+        response = self.client.get(self.url)
+        self.assertContains(response, "Results question")
+        self.assertEqual(response.context['total_votes'], 0)
+
+    def test_query_count_does_not_grow_with_choices(self):
+        """The results page is one query for 2 or 20 choices."""
+        self.add_choices(2)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        self.add_choices(18)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['choices']), 20)
+
+    def test_missing_question(self):
+        """An unknown question id is a 404."""
+        response = self.client.get(reverse('polls:results', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class ResultsJsonTests(TestCase):
+    """Check the JSON results and its conditional GET."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="voter",
+                                             password="Fat-Chance!")
+        self.question = create_question(question_text="JSON question",
+                                        days=-1)
+        self.choice = self.question.choice_set.create(choice_text="yes")
+        self.url = reverse('polls:results_json', args=(self.question.id,))
+
+    def test_counts(self):
+        """The JSON body lists the choices with their counts."""
+        Vote.objects.cast(self.user, self.choice)
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['choices'],
+                         [{'id': self.choice.id, 'choice_text': 'yes',
+                           'votes': 1, 'percent': 100.0}])
+
+    def test_not_modified(self):
+        """A matching If-None-Match costs one query and returns 304."""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_vote_changes_etag(self):
+        """A vote moves the version, so the old ETag no longer matches."""
+        etag = self.client.get(self.url)['ETag']
+        Vote.objects.cast(self.user, self.choice)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_closing_changes_etag(self):
+        """A client holding the ETag of the live results gets the final."""
+        etag = self.client.get(self.url)['ETag']
+        Question.objects.filter(pk=self.choice.question_id).update(
+            end_date=timezone.now() - datetime.timedelta(hours=1))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['closed'])
+
+    def test_question_edit_changes_etag(self):
+        """Renaming the question moves the version."""
+        etag = self.client.get(self.url)['ETag']
+        question = Question.objects.get(pk=self.choice.question_id)
+        question.question_text = 'Renamed?'
+        question.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['question_text'], 'Renamed?')
+
+    def test_choice_edit_changes_etag(self):
+        """Renaming a choice moves the version."""
+        etag = self.client.get(self.url)['ETag']
+        self.choice.choice_text = 'yes!'
+        self.choice.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_question(self):
+        """An unknown question id is a 404."""
+        response = self.client.get(reverse('polls:results_json', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class ShardedCounterTests(TestCase):
+    """Check counters spread over shards on a question with counter_shards."""
+
+    def setUp(self):
+        super().setUp()
+        self.users = [User.objects.create_user(username=f"voter{number}",
+                                               password="Fat-Chance!")
+                      for number in range(3)]
+        self.question = create_question(question_text="Hot question",
+                                        days=-1)
+        self.question.counter_shards = 4
+        self.question.save()
+        self.first = self.question.choice_set.create(choice_text="first")
+        self.second = self.question.choice_set.create(choice_text="second")
+
+    def counts(self):
+        """Return the votes of both choices as read by the results."""
+        choices = Choice.objects.filter(
+            question=self.question).with_results()
+        return [choice.votes for choice in choices]
+
+    def test_votes_go_to_shards(self):
+        """Votes leave the choice row alone and are summed on read."""
+        for user in self.users:
+            Vote.objects.cast(user, self.first)
+        Vote.objects.cast(self.users[0], self.second)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 0)
+        self.assertEqual(self.counts(), [2, 1])
+        self.assertLessEqual(ChoiceShard.objects.count(), 8)
+
+    def test_merge(self):
+        """Merging moves shard counts into the choices and bumps the version."""
+        for user in self.users:
+            Vote.objects.cast(user, self.second)
+        version = Question.objects.get(pk=self.question.pk).tally_version
+        out = StringIO()
+        call_command('merge_vote_shards', stdout=out)
+        self.assertIn('Merged', out.getvalue())
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.vote_count, 3)
+        self.assertFalse(ChoiceShard.objects.exclude(count=0).exists())
+        self.assertEqual(self.counts(), [0, 3])
+        self.assertGreater(
+            Question.objects.get(pk=self.question.pk).tally_version, version)
+        self.assertEqual(ChoiceShard.objects.merge(), 0)
+
+    def test_etag_follows_shards(self):
+        """A vote changes the JSON ETag before any merge."""
+        url = reverse('polls:results_json', args=(self.question.id,))
+        etag = self.client.get(url)['ETag']
+        Vote.objects.cast(self.users[0], self.first)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 1)
+
+    def test_recount_clears_shards(self):
+        """recount_votes rebuilds the choices and drops the shards."""
+        Vote.objects.cast(self.users[0], self.first)
+        Choice.objects.filter(question=self.question).recount_votes()
+        self.assertFalse(ChoiceShard.objects.exists())
+        self.assertEqual(self.counts(), [1, 0])
+
+
+class VotedLookupTests(TestCase):
+    """Check the batched lookup of a user's votes and where it shows."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="voter",
+                                             password="Fat-Chance!")
+        self.client.force_login(self.user)
+        self.questions = [create_question(question_text=f"Poll {number}",
+                                          days=-1 - number)
+                          for number in range(5)]
+        self.choices = [question.choice_set.create(choice_text="yes")
+                        for question in self.questions]
+        Vote.objects.cast(self.user, self.choices[1])
+        Vote.objects.cast(self.user, self.choices[3])
+
+    def test_one_query_for_many_questions(self):
+        """All questions are looked up at once."""
+        with self.assertNumQueries(1):
+            voted = get_votes_for_user(self.user, self.questions)
+        self.assertEqual(voted, {self.questions[1].pk: self.choices[1].pk,
+                                 self.questions[3].pk: self.choices[3].pk})
+
+    @shared_cache
+    def test_index_marks_voted_questions(self):
+        """The index lists which questions the user voted on."""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "(voted)", count=2)
+
+    def test_detail_preselects_choice(self):
+        """The detail page checks the choice the user voted for."""
+        response = self.client.get(
+            reverse('polls:detail', args=(self.questions[1].id,)))
+        self.assertEqual(response.context['current_choice_id'],
+                         self.choices[1].pk)
+        self.assertContains(response, f'value="{self.choices[1].id}" checked')
+
+    @override_settings(VOTE_BUFFER_ENABLED=True, VOTE_BUFFER_INTERVAL=0)
+    def test_queued_votes_count(self):
+        """A vote still in the buffer shows as the user's choice."""
+        buffer = get_vote_buffer()
+        buffer.queue(self.user.pk, self.questions[0].pk, self.choices[0].pk)
+        self.addCleanup(buffer.flush)
+        voted = get_votes_for_user(self.user, self.questions)
+        self.assertEqual(voted[self.questions[0].pk], self.choices[0].pk)
+
+
+class VoteLogTests(TestCase):
+    """Check the vote event log, its replay and compaction."""
+
+    def setUp(self):
+        super().setUp()
+        self.users = [User.objects.create_user(username=f"voter{number}",
+                                               password="Fat-Chance!")
+                      for number in range(3)]
+        self.question = create_question(question_text="Logged question",
+                                        days=-1)
+        self.first = self.question.choice_set.create(choice_text="first")
+        self.second = self.question.choice_set.create(choice_text="second")
+        for user in self.users:
+            Vote.objects.cast(user, self.first)
+        Vote.objects.cast(self.users[0], self.second)
+
+    def test_changes_are_logged(self):
+        """Each cast appends the old and new choice."""
+        events = list(VoteEvent.objects.filter(user_id=self.users[0].pk)
+                      .order_by('pk')
+                      .values_list('old_choice_id', 'new_choice_id'))
+        self.assertEqual(events, [(None, self.first.pk),
+                                  (self.first.pk, self.second.pk)])
+
+    def test_deleted_vote_is_logged(self):
+        """Deleting a user logs the removal of their vote and uncounts it."""
+        version = Question.objects.get(pk=self.question.pk).tally_version
+        self.users[1].delete()
+        self.assertEqual(VoteEvent.objects.tallies(),
+                         {self.first.pk: 1, self.second.pk: 1})
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.votes, 1)
+        self.assertGreater(
+            Question.objects.get(pk=self.question.pk).tally_version, version)
+
+    def test_deleted_question_logs_votes_in_bulk(self):
+        """Deleting a question does not cost queries per vote.
+
+        Only the log inserts grow, by one per batch the database accepts.
+        """
+        def delete_question(voters):
+            question = create_question(question_text="Big question",
+                                       days=-1)
+            choice = question.choice_set.create(choice_text="only")
+            users = User.objects.bulk_create(
+                User(username=f"bulk{voters}-{number}")
+                for number in range(voters))
+            Vote.objects.bulk_create(
+                Vote(user=user, question=question, choice=choice)
+                for user in users)
+            question_id = question.pk
+            with CaptureQueriesContext(connection) as queries:
+                question.delete()
+            self.assertEqual(VoteEvent.objects.filter(
+                question_id=question_id).count(), voters)
+            return len(queries)
+
+        self.assertLessEqual(delete_question(200), delete_question(2) + 1)
+
+    def test_replay_rebuilds_counters(self):
+        """recount_votes --from-log restores broken counters."""
+        Choice.objects.update(vote_count=99)
+        call_command('recount_votes', '--from-log', stdout=StringIO())
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.votes, self.second.votes), (2, 1))
+
+    def test_compaction_keeps_tallies(self):
+        """Folding events into a checkpoint does not change the counts."""
+        call_command('compact_vote_log', '--older-than', '-1',
+                     stdout=StringIO())
+        self.assertFalse(VoteEvent.objects.exists())
+        self.assertEqual(TallyCheckpoint.objects.count(), 1)
+        Vote.objects.cast(self.users[1], self.second)
+        self.assertEqual(VoteEvent.objects.tallies([self.question.pk]),
+                         {self.first.pk: 1, self.second.pk: 2})
+
+    def test_checkpoint_from_votes(self):
+        """A checkpoint of the Vote table supersedes older events."""
+        TallyCheckpoint.objects.from_votes()
+        self.assertEqual(VoteEvent.objects.tallies(),
+                         {self.first.pk: 2, self.second.pk: 1})
+        self.assertEqual(VoteEvent.objects.compact(timezone.now()), 4)
+        self.assertEqual(VoteEvent.objects.tallies(),
+                         {self.first.pk: 2, self.second.pk: 1})
@@ -0,0 +1,64 @@
+"""Cheap rejection of repeated and too frequent votes.
+
+Both checks keep their state in Django's cache, so workers share it when
+the cache is shared, and neither touches the database:
+
+- A vote for the choice a user's last accepted vote on the question went to,
+  posted within VOTE_DEDUP_SECONDS, e.g. by a double-click, is answered
+  like the first one without voting. Views call remember_vote() once a
+  vote is cast, so rejected and rate-limited posts are never remembered.
+- Each user has a token bucket of VOTE_BURST votes refilled at VOTE_RATE
+  per second; an empty bucket gets a 429 response.
+
+The bucket is read and written without a lock, so concurrent votes of one
+user may occasionally both pass. It is a guard against floods, not a quota.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import redirect
+
+
+def throttle_vote(request, user_id, question_id):
+    """Return a response for a duplicate or over-limit vote, else None."""
+    choice_id = request.POST.get('choice')
+    if choice_id is not None and settings.VOTE_DEDUP_SECONDS > 0:
+        if cache.get(dedup_key(user_id, question_id)) == choice_id:
+            return redirect('polls:results', question_id)
+    wait = take_token(user_id)
+    if wait:
+        response = HttpResponse('Too many votes, please slow down.',
+                                content_type='text/plain', status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+    return None
+
+
+def remember_vote(user_id, question_id, choice_id):
+    """Remember the choice of a cast vote for VOTE_DEDUP_SECONDS."""
+    if settings.VOTE_DEDUP_SECONDS > 0:
+        cache.set(dedup_key(user_id, question_id), str(choice_id),
+                  settings.VOTE_DEDUP_SECONDS)
+
+
+def dedup_key(user_id, question_id):
+    """Return the cache key of a user's last vote on a question."""
+    return f'polls:vote-last:{user_id}:{question_id}'
+
+
+def take_token(user_id):
+    """Take one vote from a user's bucket; return seconds to wait if empty."""
+    rate, burst = settings.VOTE_RATE, settings.VOTE_BURST
+    if rate <= 0 or burst <= 0:
+        return 0
+    key = f'polls:vote-bucket:{user_id}'
+    now = time.time()
+    tokens, updated = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    cache.set(key, (tokens - 1, now), math.ceil(burst / rate))
+    return 0
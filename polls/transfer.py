@@ -0,0 +1,197 @@
+"""Streamed export and import of questions, choices and votes.
+
+Rows are flat dicts with the fields in FIELDS, written as JSON Lines or CSV.
+A dump lists all questions, then all choices, then all votes, so every row
+only refers to rows before it. Votes name their user by username, as user
+ids differ between environments.
+"""
+import csv
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .cache import invalidate_index
+from .models import (ArchivedVote, Question, Choice, ResultSnapshot,
+                     TallyCheckpoint, Vote)
+
+FIELDS = ['model', 'id', 'text', 'pub_date', 'end_date', 'question', 'choice',
+          'user']
+FORMATS = ['jsonl', 'csv']
+
+
+def export_rows(questions, chunk_size=2000):
+    """Yield the rows of the given questions, their choices and votes.
+
+    Every table is read with a chunked iterator(), so memory use does not
+    grow with the number of rows.
+    """
+    for question in questions.order_by('pk').iterator(chunk_size=chunk_size):
+        yield {'model': 'question', 'id': question.pk,
+               'text': question.question_text,
+               'pub_date': question.pub_date.isoformat(),
+               'end_date': (question.end_date.isoformat()
+                            if question.end_date else None)}
+    choices = (Choice.objects.filter(question__in=questions).order_by('pk')
+               .values_list('pk', 'question_id', 'choice_text'))
+    for pk, question_id, text in choices.iterator(chunk_size=chunk_size):
+        yield {'model': 'choice', 'id': pk, 'question': question_id,
+               'text': text}
+    for model in (Vote, ArchivedVote):
+        votes = (model.objects.filter(question__in=questions).order_by('pk')
+                 .values_list('pk', 'question_id', 'choice_id',
+                              'user__username'))
+        for pk, question_id, choice_id, username in votes.iterator(
+                chunk_size=chunk_size):
+            yield {'model': 'vote', 'id': pk, 'question': question_id,
+                   'choice': choice_id, 'user': username}
+
+
+def write_rows(rows, stream, fmt):
+    """Write rows to a text stream and yield the count after each row."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            stream.write(json.dumps(row) + '\n')
+    for count, row in enumerate(rows, 1):
+        write(row)
+        yield count
+
+
+def read_rows(stream, fmt):
+    """Yield the rows of a dump read from a text stream."""
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value if value != '' else None
+                   for key, value in row.items()}
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Importer:
+    """Write dump rows to the database in batches with bulk_create.
+
+    Questions and choices that already exist, by primary key, are
+    overwritten as loaddata does. Votes overwrite the vote of the same user
+    on the same question and get ids of this database, as a vote recast
+    here has a new id. Votes of users missing from this database are
+    skipped.
+    """
+
+    def __init__(self, batch_size=2000):
+        self.batch_size = batch_size
+        self.batch = []
+        self.model = None
+        self.questions = set()
+        self.imported = 0
+        self.skipped = 0
+
+    def add(self, row):
+        """Queue one row, writing the batch when full or at a new model."""
+        if row['model'] != self.model:
+            self.flush()
+            self.model = row['model']
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the queued rows; a batch that fails is dropped."""
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        with transaction.atomic():
+            if self.model == 'question':
+                self.write_questions(batch)
+            elif self.model == 'choice':
+                self.write_choices(batch)
+            elif self.model == 'vote':
+                self.write_votes(batch)
+            else:
+                raise ValueError(f'Unknown model "{self.model}" in dump.')
+
+    def finish(self):
+        """Write what is left, then fix counters, id sequences and caches.
+
+        Snapshots of the imported questions are dropped and refrozen from
+        the imported votes on their next results request. Imported votes
+        bypass the vote log, so it restarts from a checkpoint of all votes.
+        Call it when a batch fails as well: the batches written before it
+        still need their counters fixed.
+        """
+        try:
+            self.flush()
+        finally:
+            self.recount()
+
+    def recount(self):
+        """Fix the counters, id sequences and caches after the writes."""
+        question_ids = sorted(self.questions)
+        for start in range(0, len(question_ids), self.batch_size):
+            batch = question_ids[start:start + self.batch_size]
+            Choice.objects.filter(question_id__in=batch).recount_votes()
+            ResultSnapshot.objects.filter(question_id__in=batch).delete()
+        TallyCheckpoint.objects.from_votes()
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Question, Choice]):
+                cursor.execute(sql)
+        invalidate_index()
+
+    def write_questions(self, rows):
+        """Insert or overwrite a batch of questions."""
+        Question.objects.bulk_create(
+            [Question(pk=int(row['id']), question_text=row['text'],
+                      pub_date=parse_datetime(row['pub_date']),
+                      end_date=(parse_datetime(row['end_date'])
+                                if row.get('end_date') else None))
+             for row in rows],
+            update_conflicts=True, unique_fields=['id'],
+            update_fields=['question_text', 'pub_date', 'end_date'])
+        # Imported votes overwrite the Vote table, so archived ones of the
+        # same questions go back there first.
+        ArchivedVote.objects.restore([int(row['id']) for row in rows])
+        self.questions.update(int(row['id']) for row in rows)
+        self.imported += len(rows)
+
+    def write_choices(self, rows):
+        """Insert or overwrite a batch of choices."""
+        Choice.objects.bulk_create(
+            [Choice(pk=int(row['id']), question_id=int(row['question']),
+                    choice_text=row['text'])
+             for row in rows],
+            update_conflicts=True, unique_fields=['id'],
+            update_fields=['question', 'choice_text'])
+        self.questions.update(int(row['question']) for row in rows)
+        self.imported += len(rows)
+
+    def write_votes(self, rows):
+        """Insert or overwrite a batch of votes, matching users by name.
+
+        A user's last vote on a question in the batch wins, as one upsert
+        cannot change the same row twice.
+        """
+        users = dict(User.objects.filter(
+            username__in={row['user'] for row in rows}
+        ).values_list('username', 'pk'))
+        votes = {}
+        for row in rows:
+            if row['user'] in users:
+                vote = Vote(user_id=users[row['user']],
+                            question_id=int(row['question']),
+                            choice_id=int(row['choice']))
+                votes[vote.user_id, vote.question_id] = vote
+        votes = list(votes.values())
+        Vote.objects.bulk_create(
+            votes, update_conflicts=True, unique_fields=['user', 'question'],
+            update_fields=['choice'])
+        self.questions.update(vote.question_id for vote in votes)
+        self.imported += len(votes)
+        self.skipped += len(rows) - len(votes)
@@ -3,12 +3,19 @@ from django.urls import path
 from django.contrib.auth.decorators import login_required
 
 from . import views
+from .routers import replica_reads
 
 app_name = 'polls'
 
 urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
+    path('', replica_reads(views.IndexView.as_view()), name='index'),
+    path('archive/', replica_reads(views.ArchiveView.as_view()),
+         name='archive'),
     path('<int:pk>/', login_required(views.DetailView.as_view()), name='detail'),
-    path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote'),
+    path('<int:pk>/results/', replica_reads(views.ResultsView.as_view()),
+         name='results'),
+    path('<int:pk>/results.json', replica_reads(views.results_json),
+         name='results_json'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('<int:question_id>/vote/', login_required(views.vote), name='vote'),
 ]
@@ -1,10 +1,27 @@
 """Create view for ku-polls."""
+import base64
+import binascii
+import zlib
+
+from django.conf import settings
+from django.http import (Http404, HttpResponse, HttpResponseForbidden,
+                         JsonResponse)
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import NoReverseMatch, reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
 from django.views import generic
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.utils import timezone
 from django.contrib import messages
 
-from .models import Question, Choice, Vote
+from .buffer import get_vote_buffer
+from .cache import latest_questions
+from .metrics import registry
+from .models import ArchivedVote, Question, Choice, ChoiceShard, Vote
+from .snapshots import can_freeze, snapshot_for
+from .throttle import remember_vote, throttle_vote
 
 
 class IndexView(generic.ListView):
@@ -15,8 +32,83 @@ class IndexView(generic.ListView):
 
     def get_queryset(self):
         """Return the last five published questions."""
-        return Question.objects.filter(pub_date__lte=timezone.now()
-                                       ).order_by('-pub_date')[:5]
+        return latest_questions()
+
+    def get_context_data(self, **kwargs):
+        """Add the user's chosen choice ids of the listed questions."""
+        context = super().get_context_data(**kwargs)
+        context['voted'] = get_votes_for_user(self.request.user,
+                                              context['object_list'])
+        return context
+
+
+ARCHIVE_PAGE_SIZE = 20
+ARCHIVE_STATUSES = ['all', 'open', 'closed', 'upcoming']
+
+
+class ArchiveView(generic.ListView):
+    """Every question, newest first, one keyset page at a time.
+
+    Pages are chained by a cursor holding the (pub_date, id) of the last
+    question shown, so a deep page costs as much as the first one.
+    ?status= keeps open, closed or upcoming questions; upcoming ones are
+    only listed for staff.
+    """
+
+    template_name = 'polls/archive.html'
+    context_object_name = 'questions'
+
+    def get_queryset(self):
+        """Return one page of questions after the cursor."""
+        self.status = self.request.GET.get('status', 'all')
+        if self.status not in ARCHIVE_STATUSES or (
+                self.status == 'upcoming' and not self.request.user.is_staff):
+            raise Http404('Unknown poll status.')
+        now = timezone.now()
+        questions = Question.objects.with_status(now)
+        if self.status == 'all':
+            if not self.request.user.is_staff:
+                questions = questions.published(now)
+        else:
+            questions = getattr(questions, self.status)(now)
+        if 'after' in self.request.GET:
+            questions = questions.before(
+                *decode_cursor(self.request.GET['after']))
+        page = list(questions.order_by('-pub_date', '-pk')
+                    [:ARCHIVE_PAGE_SIZE + 1])
+        self.next_cursor = (encode_cursor(page[ARCHIVE_PAGE_SIZE - 1])
+                            if len(page) > ARCHIVE_PAGE_SIZE else None)
+        return page[:ARCHIVE_PAGE_SIZE]
+
+    def get_context_data(self, **kwargs):
+        """Add the status filter and the cursor of the next page."""
+        context = super().get_context_data(**kwargs)
+        context['status'] = self.status
+        context['statuses'] = [status for status in ARCHIVE_STATUSES
+                               if status != 'upcoming'
+                               or self.request.user.is_staff]
+        context['next_cursor'] = self.next_cursor
+        return context
+
+
+def encode_cursor(question):
+    """Return the archive cursor pointing after a question."""
+    key = f'{question.pub_date.isoformat()}~{question.pk}'
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the (pub_date, id) of an archive cursor, or raise Http404."""
+    try:
+        pub_date, pk = (base64.urlsafe_b64decode(cursor.encode()).decode()
+                        .split('~'))
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        pub_date = None
+    if pub_date is None:
+        raise Http404('Invalid page cursor.')
+    return pub_date, pk
 
 
 class DetailView(generic.DetailView):
@@ -27,17 +119,25 @@ class DetailView(generic.DetailView):
 
     def get_queryset(self):
         """Excludes any questions that aren't published yet."""
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        now = timezone.now()
+        return Question.objects.published(now).with_status(now)
 
     def get(self, request, *args, **kwargs):
         """Render if can_vote redirect if cant vote."""
         self.object = self.get_object()
-        if self.object.can_vote():
+        if self.object.status == Question.OPEN:
             return render(request, self.template_name, self.get_context_data())
         else:
             messages.error(request, 'Vote is not allowed')
             return redirect('polls:index')
 
+    def get_context_data(self, **kwargs):
+        """Add the choice id the user voted for, to pre-select it."""
+        context = super().get_context_data(**kwargs)
+        context['current_choice_id'] = get_votes_for_user(
+            self.request.user, [self.object]).get(self.object.pk)
+        return context
+
 
 class ResultsView(generic.DetailView):
     """Class for ResultsView."""
@@ -45,31 +145,202 @@ class ResultsView(generic.DetailView):
     model = Question
     template_name = 'polls/results.html'
 
+    def get_object(self, queryset=None):
+        """Load the question together with its choices and vote totals."""
+        self.choices = list(Choice.objects.filter(question_id=self.kwargs['pk'])
+                            .with_results()
+                            .select_related('question__snapshot'))
+        if self.choices:
+            return self.choices[0].question
+        return get_object_or_404(Question, pk=self.kwargs['pk'])
+
+    def get_context_data(self, **kwargs):
+        """Add the loaded choices and the total number of votes.
+
+        A closed question is shown from its frozen snapshot instead.
+        """
+        context = super().get_context_data(**kwargs)
+        snapshot = snapshot_for(self.object, timezone.now())
+        if snapshot is not None:
+            context['snapshot'] = snapshot
+            context['total_votes'] = snapshot.total
+            return context
+        context['choices'] = self.choices
+        context['stream_url'] = results_stream_url(self.object.pk)
+        context['total_votes'] = (self.choices[0].total_votes
+                                  if self.choices else 0)
+        buffer = get_vote_buffer()
+        if buffer is not None and self.request.user.is_authenticated:
+            pending = buffer.pending_choice(self.request.user.pk,
+                                            self.object.pk)
+            if pending is not None:
+                stored = get_vote_for_user(self.request.user, self.object)
+                context['total_votes'] = count_pending_vote(
+                    self.choices, context['total_votes'], pending,
+                    stored.choice_id if stored else None)
+        return context
+
+
+def results_stream_url(question_id):
+    """Return the live results URL of a question, or None when not served.
+
+    The stream is only routed by kupolls.async_urls, as it needs ASGI.
+    """
+    try:
+        return reverse('polls:results_stream', args=(question_id,))
+    except NoReverseMatch:
+        return None
+
+
+def count_pending_vote(choices, total, pending, stored):
+    """Count a user's queued vote so they see it before a flush.
+
+    pending is the queued choice id and stored the choice id already in the
+    Vote table, or None. Adjust the loaded choices in place and return the
+    total number of votes including the queued one.
+    """
+    if pending == stored:
+        return total
+    if stored is None:
+        total += 1
+    for choice in choices:
+        if choice.pk == pending:
+            choice.vote_count += 1
+        elif choice.pk == stored:
+            choice.vote_count -= 1
+        choice.total_votes = total
+    return total
+
+
+def results_etag(request, pk):
+    """Return the ETag of a question's results, from its tally version.
+
+    Votes on a sharded question do not change its version until the shards
+    are merged, so the unmerged shard counts are added to its ETag. Once
+    the results are served from a snapshot, the end_date it holds for is
+    added too.
+    """
+    question = (Question.objects.filter(pk=pk)
+                .only('tally_version', 'counter_shards', 'pub_date',
+                      'end_date').first())
+    if question is None:
+        raise Http404('No question matches the given query.')
+    etag = f'{pk}-{question.tally_version}'
+    if can_freeze(question, timezone.now()):
+        etag += f'-c{int(question.end_date.timestamp())}'
+    if question.counter_shards <= 1:
+        return etag
+    counts = (ChoiceShard.objects.filter(choice__question_id=pk)
+              .order_by('pk').values_list('pk', 'count'))
+    return f'{etag}-{zlib.crc32(repr(list(counts)).encode()):08x}'
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=results_etag)
+def results_json(request, pk):
+    """Return the choices and vote counts of a question as JSON.
+
+    A client sending the last ETag back in If-None-Match gets a 304 after a
+    single lookup of the question's tally version.
+    """
+    choices = list(Choice.objects.filter(question_id=pk).with_results()
+                   .select_related('question__snapshot'))
+    question = (choices[0].question if choices
+                else get_object_or_404(Question, pk=pk))
+    snapshot = snapshot_for(question, timezone.now())
+    if snapshot is not None:
+        return JsonResponse({
+            'question': question.pk,
+            'question_text': question.question_text,
+            'version': question.tally_version,
+            'total': snapshot.total,
+            'choices': snapshot.choices,
+            'closed': True,
+        })
+    return JsonResponse({
+        'question': question.pk,
+        'question_text': question.question_text,
+        'version': question.tally_version,
+        'total': choices[0].total_votes if choices else 0,
+        'choices': [{'id': choice.pk, 'choice_text': choice.choice_text,
+                     'votes': choice.votes, 'percent': choice.percent}
+                    for choice in choices],
+        'closed': False,
+    })
+
+
+def metrics(request):
+    """Expose the request metrics in the Prometheus text format.
+
+    Scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>";
+    without a token configured, only staff can read the metrics.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        allowed = constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
+
 
 def vote(request, question_id):
     """Keep vote result for question."""
-    question = get_object_or_404(Question, pk=question_id)
+    throttled = throttle_vote(request, request.user.pk, question_id)
+    if throttled is not None:
+        return throttled
     try:
-        selected_choice = question.choice_set.get(pk=request.POST['choice'])
-    except (KeyError, Choice.DoesNotExist):
+        selected_choice = (Choice.objects.select_related('question')
+                           .get(pk=request.POST['choice'],
+                                question_id=question_id))
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        question = get_object_or_404(Question, pk=question_id)
         return render(request,
                       'polls/detail.html',
                       {'question': question,
                        'error_message': "You didn't select a choice.",
                        })
     else:
-        user = request.user
-        user_vote = get_vote_for_user(user, question)
-
-        if user_vote is None:
-            # Create vote.
-            user_vote = Vote.objects.create(user=user, choice=selected_choice)
+        question = selected_choice.question
+        if not question.can_vote() or question.votes_archived:
+            messages.error(request, 'Vote is not allowed')
+            return redirect('polls:index')
+        buffer = get_vote_buffer()
+        if buffer is None:
+            Vote.objects.cast(request.user, selected_choice)
         else:
-            # Modify existing vote.
-            user_vote.choice = selected_choice
+            buffer.add(request.user.pk, selected_choice.question_id,
+                       selected_choice.pk)
+        remember_vote(request.user.pk, question_id, selected_choice.pk)
+        return redirect('polls:results', question_id)
+
+
+def get_votes_for_user(user, questions):
+    """Return {question id: choice id} of a user's votes on many questions.
 
-        user_vote.save()
-        return redirect('polls:results', question.id)
+    The stored votes come from one query whatever the number of questions,
+    and votes still queued in the vote buffer replace them.
+    """
+    if not user.is_authenticated:
+        return {}
+    question_ids = [question.pk for question in questions]
+    if not question_ids:
+        return {}
+    chosen = dict(Vote.objects.filter(user=user, question_id__in=question_ids)
+                  .values_list('question_id', 'choice_id'))
+    archived_ids = [question.pk for question in questions
+                    if question.votes_archived]
+    if archived_ids:
+        chosen.update(ArchivedVote.objects
+                      .filter(user=user, question_id__in=archived_ids)
+                      .values_list('question_id', 'choice_id'))
+    buffer = get_vote_buffer()
+    if buffer is not None:
+        chosen.update(buffer.pending_choices(user.pk, question_ids))
+    return chosen
 
 
 def get_vote_for_user(user, question):
@@ -78,10 +349,9 @@ def get_vote_for_user(user, question):
     Returns:
         The user's vote or None if there are no votes for this question.
     """
-    try:
-        votes = Vote.objects.filter(user=user).filter(choice__question=question)
-        if votes.count() == 0:
-            return None
-        return votes[0]
-    except Vote.DoesNotExist:
-        return None
+    vote = None
+    if question.votes_archived:
+        vote = ArchivedVote.objects.filter(user=user,
+                                           question=question).first()
+    # An interrupted archive run may leave votes of archived questions.
+    return vote or Vote.objects.filter(user=user, question=question).first()